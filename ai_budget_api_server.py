@@ -1,44 +1,274 @@
 # Flask API Server for AI Budget ML Model Integration
 # This server provides REST APIs to integrate the ML model with the Next.js frontend
 
-from flask import Flask, request, jsonify
+import time
+_MODULE_STARTED = time.perf_counter()
+
+from flask import Flask, request, jsonify, g, make_response, send_file
 from flask_cors import CORS
+import functools
+import hashlib
+import hmac
 import json
+import threading
 from datetime import datetime, timedelta
 import numpy as np
-import pandas as pd
-from ai_budget_ml_model import AIBudgetManager
+from ai_budget_ml_model import AIBudgetManager, lazy_import
+from ai_budget_model_registry import ModelRegistry, ModelNotFoundError
+from ai_budget_feature_store import FeatureSnapshotStore
+from ai_budget_profiling import RequestProfiler
+from ai_budget_columnar import COLUMNAR_CONTENT_TYPES, decode_columnar_request
+from ai_budget_response_cache import ResponseCache
 import logging
+import os
+
+# pandas is only needed by some handlers; load it on first use
+pd = lazy_import('pandas')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Directory holding CSV/Parquet expense history for out-of-core retraining
+TRAINING_DATA_DIR = os.environ.get('AI_BUDGET_TRAINING_DATA_DIR', 'training_data')
+
+# Persisted artifact the default model is loaded from (and saved to after a cold start)
+MODEL_ARTIFACT_PATH = os.environ.get('AI_BUDGET_MODEL_PATH', 'ai_budget_model.pkl')
+
+# Directory holding model artifacts that can be registered at runtime
+MODEL_ARTIFACT_DIR = os.environ.get('AI_BUDGET_MODEL_ARTIFACT_DIR', 'models')
+
+# SQLite file holding per-user monthly spending and precomputed lag features
+FEATURE_STORE_PATH = os.environ.get('AI_BUDGET_FEATURE_STORE', 'ai_budget_features.db')
+
+# Handler profiling: off (default, nothing is wrapped), header (X-Profile requests) or all
+PROFILING_MODE = os.environ.get('AI_BUDGET_PROFILING', 'off')
+
+# Token required by the /api/admin endpoints (X-Admin-Token header); unset allows loopback clients only
+ADMIN_TOKEN = os.environ.get('AI_BUDGET_ADMIN_TOKEN')
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Next.js integration
 
-# Initialize AI Budget Manager
+# Per-user lag features shared by every served model
+feature_store = FeatureSnapshotStore(FEATURE_STORE_PATH)
+
+# Initialize AI Budget Manager; the model itself is loaded in the background
 ai_budget = AIBudgetManager()
+ai_budget.feature_store = feature_store
+
+# Warm-up state of the default model: cold -> warming -> ready | failed
+warmup_state = {
+    'status': 'cold',
+    'source': None,
+    'error': None,
+    'started_at': None,
+    'ready_seconds': None
+}
+_warmup_lock = threading.Lock()
+
+def _warm_up_model():
+    """Load the default model from its artifact, training and saving one if missing"""
+    try:
+        if os.path.exists(MODEL_ARTIFACT_PATH):
+            logger.info(f"🔄 Loading AI Budget Model from {MODEL_ARTIFACT_PATH}...")
+            ai_budget.load_model(MODEL_ARTIFACT_PATH)
+            warmup_state['source'] = 'artifact'
+        
+        if not ai_budget.is_trained:
+            logger.info("🚀 No model artifact found, training AI Budget Model...")
+            ai_budget.train_models()
+            ai_budget.save_model(MODEL_ARTIFACT_PATH)
+            warmup_state['source'] = 'trained'
+        
+        warmup_state['ready_seconds'] = time.perf_counter() - _MODULE_STARTED
+        warmup_state['status'] = 'ready'
+        logger.info(f"✅ AI Budget Model ready {warmup_state['ready_seconds']:.2f}s after startup")
+    except Exception as e:
+        warmup_state['error'] = str(e)
+        warmup_state['status'] = 'failed'
+        logger.error(f"❌ Failed to warm up model: {str(e)}")
+
+def start_model_warmup():
+    """Start loading the default model in a background thread, once"""
+    with _warmup_lock:
+        if warmup_state['status'] != 'cold':
+            return
+        warmup_state['status'] = 'warming'
+        warmup_state['started_at'] = datetime.now().isoformat()
+    threading.Thread(target=_warm_up_model, name='model-warmup', daemon=True).start()
+
+@app.before_request
+def _ensure_model_warmup():
+    """Start the warm-up when the app is served by a WSGI server that skips __main__"""
+    if warmup_state['status'] == 'cold':
+        start_model_warmup()
+
+# Registry of served models; the startup model is the pinned 'default' model
+model_registry = ModelRegistry(
+    max_loaded_bytes=int(os.environ.get('AI_BUDGET_MODEL_MEMORY_BYTES', 2 * 1024 ** 3)),
+    max_loaded_models=int(os.environ.get('AI_BUDGET_MAX_LOADED_MODELS', 8)),
+    feature_store=feature_store
+)
+model_registry.register('default', '1', manager=ai_budget, default=True)
+
+def _artifact_path(filename):
+    """Resolve an artifact filename inside MODEL_ARTIFACT_DIR, or None if it escapes it"""
+    artifact_dir = os.path.realpath(MODEL_ARTIFACT_DIR)
+    path = os.path.realpath(os.path.join(artifact_dir, filename))
+    return path if os.path.commonpath([path, artifact_dir]) == artifact_dir else None
+
+# Cache for analytics responses; set AI_BUDGET_CACHE_DB to keep results across restarts
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get('AI_BUDGET_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl_seconds=int(os.environ.get('AI_BUDGET_CACHE_TTL', 3600)),
+    disk_path=os.environ.get('AI_BUDGET_CACHE_DB') or None
+)
+
+# Saved handler profiles, newest AI_BUDGET_PROFILE_RETENTION kept
+request_profiler = RequestProfiler(
+    directory=os.environ.get('AI_BUDGET_PROFILE_DIR', 'profiles'),
+    mode=PROFILING_MODE,
+    default_format=os.environ.get('AI_BUDGET_PROFILE_FORMAT', 'pstats'),
+    max_profiles=int(os.environ.get('AI_BUDGET_PROFILE_RETENTION', 50))
+)
+
+def _request_payload():
+    """Request fields and expense frame of this request, decoded once
 
-# Train the model on startup
-try:
-    logger.info("🚀 Training AI Budget Model on startup...")
-    ai_budget.train_models()
-    logger.info("✅ AI Budget Model trained successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to train model: {str(e)}")
+    JSON bodies give ``(json or None, None)``; columnar bodies (npz / Arrow
+    IPC) give their JSON request fields and the decoded expense DataFrame.
+    Raises ValueError for malformed columnar bodies.
+    """
+    if 'request_payload' not in g:
+        if request.mimetype in COLUMNAR_CONTENT_TYPES:
+            g.request_payload = decode_columnar_request(request.get_data(), request.mimetype)
+        else:
+            g.request_payload = (request.get_json(silent=True), None)
+    return g.request_payload
+
+def _expense_request():
+    """Request data for the expense analytics endpoints, from JSON or a columnar body
+
+    For columnar bodies ``data['expenses']`` is the decoded DataFrame, which
+    the analytics accept in place of a list of expense dicts.
+    """
+    if request.mimetype in COLUMNAR_CONTENT_TYPES:
+        fields, expense_frame = _request_payload()
+        return {**fields, 'expenses': expense_frame}
+    return request.get_json()
+
+def routed_model(view):
+    """Route a request to a registered model by header or body field
+    
+    The model is chosen with the X-Model-Name / X-Model-Version headers or the
+    'model' / 'model_version' body fields, and A/B traffic splits are keyed on
+    the user id. The selected manager is available as ``g.model``.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            data = _request_payload()[0] or {}
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        user_data = data.get('user_data') if isinstance(data.get('user_data'), dict) else data
+        routing_key = request.headers.get('X-User-Id', user_data.get('user_id'))
+        g.routing_key = routing_key
+        
+        try:
+            g.model, g.model_key = model_registry.get(
+                name=request.headers.get('X-Model-Name', data.get('model')),
+                version=request.headers.get('X-Model-Version', data.get('model_version')),
+                routing_key=routing_key
+            )
+        except ModelNotFoundError as e:
+            return jsonify({'error': str(e.args[0])}), 404
+        
+        if not g.model.is_trained and warmup_state['status'] in ('cold', 'warming'):
+            return jsonify({'error': 'Model is warming up, retry shortly'}), 503, {'Retry-After': '5'}
+        
+        started = time.perf_counter()
+        response = make_response(view(*args, **kwargs))
+        model_registry.record_latency(g.model_key, time.perf_counter() - started)
+        response.headers['X-Model'] = ':'.join(g.model_key)
+        return response
+    return wrapper
+
+def _startup_report():
+    """Startup timings for health and readiness responses"""
+    return {
+        'import_seconds': IMPORT_SECONDS,
+        'ready_seconds': warmup_state['ready_seconds'],
+        'warmup_started_at': warmup_state['started_at'],
+        'model_source': warmup_state['source']
+    }
+
+def cached_response(view):
+    """Serve identical requests for the same model version from the response cache
+    
+    The key covers the endpoint, the canonical request body (raw bytes and
+    content type for columnar bodies), the serving model and its version,
+    the user's stored lag features and the current date (results depend on
+    the current month). Concurrent identical requests share one computation.
+    Hits return the stored body unchanged, so its ``timestamp`` is the time
+    the result was computed, not when it was served; the ``X-Cache`` header
+    tells hits from misses. Profiled requests bypass the cache so the
+    profile shows the real computation. Must be applied below
+    ``routed_model``.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request_profiler.enabled and request_profiler.requested_format(request.headers):
+            return view(*args, **kwargs)
+        
+        body = request.get_json(silent=True)
+        key = response_cache.make_key(
+            request.path,
+            body if body is not None else [request.mimetype, hashlib.sha256(request.get_data()).hexdigest()],
+            g.model_key,
+            g.model.model_version,
+            feature_store.lag_features(g.routing_key) if g.routing_key is not None else None,
+            datetime.now().date().isoformat()
+        )
+        
+        def compute():
+            response = make_response(view(*args, **kwargs))
+            return response.status_code, response.get_data(), response.status_code == 200
+        
+        status, data, source = response_cache.get_or_compute(key, compute)
+        response = app.response_class(data, status=status, mimetype='application/json')
+        response.headers['X-Cache'] = source.upper()
+        return response
+    return wrapper
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint; reports 'warming' until the model is loaded"""
+    status = {'ready': 'healthy', 'failed': 'degraded'}.get(warmup_state['status'], 'warming')
     return jsonify({
-        'status': 'healthy',
+        'status': status,
         'model_trained': ai_budget.is_trained,
+        'startup': _startup_report(),
+        'error': warmup_state['error'],
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint; 200 once predictions are available, 503 before"""
+    ready = warmup_state['status'] == 'ready' and ai_budget.is_trained
+    return jsonify({
+        'ready': ready,
+        'status': warmup_state['status'],
+        'startup': _startup_report(),
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
 @app.route('/api/predict-spending', methods=['POST'])
+@routed_model
 def predict_spending():
     """Predict future spending for a user"""
     try:
@@ -55,7 +285,7 @@ def predict_spending():
             data['month'] = datetime.now().month
         
         # Get prediction
-        prediction = ai_budget.predict_spending(data)
+        prediction = g.model.predict_spending(data)
         
         if prediction is None:
             return jsonify({'error': 'Model not trained'}), 500
@@ -71,16 +301,18 @@ def predict_spending():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/detect-anomalies', methods=['POST'])
+@routed_model
+@cached_response
 def detect_anomalies():
     """Detect spending anomalies"""
     try:
-        data = request.get_json()
+        data = _expense_request()
         
         if 'expenses' not in data:
             return jsonify({'error': 'Missing expenses data'}), 400
         
         expenses = data['expenses']
-        anomalies = ai_budget.detect_anomalies(expenses)
+        anomalies = g.model.detect_anomalies(expenses)
         
         return jsonify({
             'success': True,
@@ -94,6 +326,7 @@ def detect_anomalies():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/budget-recommendations', methods=['POST'])
+@routed_model
 def get_budget_recommendations():
     """Generate budget recommendations"""
     try:
@@ -108,7 +341,7 @@ def get_budget_recommendations():
         user_data = data['user_data']
         historical_expenses = data['historical_expenses']
         
-        recommendations = ai_budget.generate_budget_recommendations(user_data, historical_expenses)
+        recommendations = g.model.generate_budget_recommendations(user_data, historical_expenses)
         
         return jsonify({
             'success': True,
@@ -122,16 +355,18 @@ def get_budget_recommendations():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/spending-trends', methods=['POST'])
+@routed_model
+@cached_response
 def analyze_spending_trends():
     """Analyze spending trends"""
     try:
-        data = request.get_json()
+        data = _expense_request()
         
         if 'expenses' not in data:
             return jsonify({'error': 'Missing expenses data'}), 400
         
         expenses = data['expenses']
-        trends = ai_budget.analyze_spending_trends(expenses)
+        trends = g.model.analyze_spending_trends(expenses)
         
         return jsonify({
             'success': True,
@@ -144,10 +379,12 @@ def analyze_spending_trends():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/smart-insights', methods=['POST'])
+@routed_model
+@cached_response
 def get_smart_insights():
     """Get comprehensive smart insights"""
     try:
-        data = request.get_json()
+        data = _expense_request()
         
         # Validate required fields
         required_fields = ['user_data', 'expenses']
@@ -159,7 +396,7 @@ def get_smart_insights():
         expenses = data['expenses']
         budget_goals = data.get('budget_goals', None)
         
-        insights = ai_budget.get_smart_insights(user_data, expenses, budget_goals)
+        insights = g.model.get_smart_insights(user_data, expenses, budget_goals)
         
         return jsonify({
             'success': True,
@@ -172,6 +409,7 @@ def get_smart_insights():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/category-predictions', methods=['POST'])
+@routed_model
 def get_category_predictions():
     """Get predictions for all categories"""
     try:
@@ -183,18 +421,13 @@ def get_category_predictions():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        # Get predictions for all categories
-        predictions = {}
-        for category in ai_budget.categories:
-            prediction_data = {**data, 'category': category}
-            prediction = ai_budget.predict_spending(prediction_data)
-            if prediction:
-                predictions[category] = prediction
+        # Get predictions for all categories from one model snapshot
+        predictions = g.model.predict_categories(data)
         
         return jsonify({
             'success': True,
             'predictions': predictions,
-            'categories': ai_budget.categories,
+            'categories': list(predictions) or g.model.categories,
             'timestamp': datetime.now().isoformat()
         })
     
@@ -202,7 +435,64 @@ def get_category_predictions():
         logger.error(f"Error in get_category_predictions: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# Longest forecast horizon accepted by /api/spending-forecast, in months
+MAX_FORECAST_HORIZON = 24
+
+@app.route('/api/spending-forecast', methods=['POST'])
+@routed_model
+def forecast_spending():
+    """Forecast spending per category for the next months in one call
+    
+    The current-month prediction is shaped by the seasonal multipliers and,
+    when the request carries the user's ``expenses`` history (per user in
+    batch mode), carried forward with each category's trend in that history.
+    """
+    try:
+        data = request.get_json()
+        
+        horizon = int(data.get('horizon', 3))
+        if not 1 <= horizon <= MAX_FORECAST_HORIZON:
+            return jsonify({'error': f'horizon must be between 1 and {MAX_FORECAST_HORIZON}'}), 400
+        
+        # Batch mode: forecast many users at once
+        if 'users' in data:
+            histories = [user.get('expenses') for user in data['users']]
+            forecast = g.model.forecast_spending_batch(data['users'], horizon, expenses=histories)
+            if forecast is None:
+                return jsonify({'error': 'Model not trained'}), 500
+            
+            return jsonify({
+                'success': True,
+                'categories': forecast['categories'],
+                'months': forecast['months'].tolist(),
+                'forecasts': forecast['forecast'].round(2).tolist(),
+                'totals': forecast['forecast'].sum(axis=1).round(2).tolist(),
+                'count': len(data['users']),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        # Validate required fields
+        required_fields = ['user_income', 'user_age']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        forecast = g.model.forecast_spending(data, horizon, expenses=data.get('expenses'))
+        if forecast is None:
+            return jsonify({'error': 'Model not trained'}), 500
+        
+        return jsonify({
+            'success': True,
+            'forecast': forecast,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in forecast_spending: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/budget-optimization', methods=['POST'])
+@routed_model
 def optimize_budget():
     """Optimize budget allocation"""
     try:
@@ -217,37 +507,23 @@ def optimize_budget():
         current_budget = data['current_budget']
         total_budget = data['total_budget']
         
-        # Get predictions for all categories
-        predictions = {}
-        for category in ai_budget.categories:
-            prediction_data = {**user_data, 'category': category}
-            prediction = ai_budget.predict_spending(prediction_data)
-            if prediction:
-                predictions[category] = prediction['predicted_amount']
+        # Constrained allocation over all categories from one batched prediction
+        optimization = g.model.optimize_budget(
+            user_data, total_budget,
+            min_allocations=data.get('min_allocations'),
+            max_allocations=data.get('max_allocations'),
+            fixed_costs=data.get('fixed_costs'),
+            priorities=data.get('priorities')
+        )
         
-        # Optimize budget allocation
-        optimized_budget = {}
-        total_predicted = sum(predictions.values())
+        if optimization is None:
+            return jsonify({'error': 'Model not trained'}), 500
         
-        if total_predicted > 0:
-            # Proportionally allocate budget based on predictions
-            for category, predicted_amount in predictions.items():
-                proportion = predicted_amount / total_predicted
-                optimized_budget[category] = round(total_budget * proportion, 2)
+        optimized_budget = optimization['allocations']
+        predictions = optimization['predictions']
         
         # Calculate savings opportunities
-        savings_opportunities = []
-        for category, current_amount in current_budget.items():
-            predicted_amount = predictions.get(category, current_amount)
-            if current_amount > predicted_amount * 1.2:  # 20% buffer
-                potential_savings = current_amount - (predicted_amount * 1.1)  # 10% buffer
-                savings_opportunities.append({
-                    'category': category,
-                    'current_budget': current_amount,
-                    'recommended_budget': predicted_amount * 1.1,
-                    'potential_savings': potential_savings,
-                    'confidence': 'medium'
-                })
+        savings_opportunities = g.model.find_savings_opportunities(current_budget, predictions)
         
         return jsonify({
             'success': True,
@@ -255,6 +531,67 @@ def optimize_budget():
             'predictions': predictions,
             'savings_opportunities': savings_opportunities,
             'total_savings': sum([s['potential_savings'] for s in savings_opportunities]),
+            'fixed_costs': optimization['fixed_costs'],
+            'status': optimization['status'],
+            'unallocated': optimization['unallocated'],
+            'shortfall': optimization['shortfall'],
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in optimize_budget: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/budget-optimization/batch', methods=['POST'])
+@routed_model
+def optimize_budget_batch():
+    """Optimize budget allocations for many users in one vectorized pass"""
+    try:
+        data = request.get_json()
+        
+        if 'users' not in data:
+            return jsonify({'error': 'Missing required field: users'}), 400
+        
+        users = data['users']
+        for i, user in enumerate(users):
+            for field in ['user_data', 'total_budget']:
+                if field not in user:
+                    return jsonify({'error': f'Missing required field: users[{i}].{field}'}), 400
+        
+        optimization = g.model.optimize_budgets_batch(
+            [user['user_data'] for user in users],
+            [user['total_budget'] for user in users],
+            min_allocations=[user.get('min_allocations') for user in users],
+            max_allocations=[user.get('max_allocations') for user in users],
+            fixed_costs=[user.get('fixed_costs') for user in users],
+            priorities=[user.get('priorities') for user in users]
+        )
+        
+        if optimization is None:
+            return jsonify({'error': 'Model not trained'}), 500
+        
+        categories = optimization['categories']
+        results = [
+            {
+                'user_id': user['user_data'].get('user_id'),
+                'optimized_budget': dict(zip(categories, allocations)),
+                'status': status,
+                'unallocated': unallocated,
+                'shortfall': shortfall
+            }
+            for user, allocations, status, unallocated, shortfall in zip(
+                users,
+                optimization['allocations'].round(2).tolist(),
+                optimization['status'],
+                optimization['unallocated'].tolist(),
+                optimization['shortfall'].tolist()
+            )
+        ]
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results),
             'timestamp': datetime.now().isoformat()
         })
     
@@ -263,10 +600,12 @@ def optimize_budget():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/seasonal-analysis', methods=['POST'])
+@routed_model
+@cached_response
 def seasonal_analysis():
     """Analyze seasonal spending patterns"""
     try:
-        data = request.get_json()
+        data = _expense_request()
         
         if 'expenses' not in data:
             return jsonify({'error': 'Missing expenses data'}), 400
@@ -277,13 +616,12 @@ def seasonal_analysis():
         seasonal_data = {}
         monthly_totals = {}
         
-        for expense in expenses:
-            expense_date = datetime.fromisoformat(expense['date'])
-            month = expense_date.month
-            
-            if month not in monthly_totals:
-                monthly_totals[month] = 0
-            monthly_totals[month] += expense['amount']
+        if len(expenses):
+            expense_frame = g.model.normalize_expenses(expenses)
+            monthly_totals = {
+                int(month): float(total)
+                for month, total in expense_frame.groupby('month')['amount'].sum().items()
+            }
         
         # Calculate seasonal multipliers
         if monthly_totals:
@@ -325,14 +663,77 @@ def seasonal_analysis():
         logger.error(f"Error in seasonal_analysis: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/alerts/batch', methods=['POST'])
+def generate_alerts_batch():
+    """Budget alerts for many users in one pass, e.g. for the nightly notification job"""
+    try:
+        data = request.get_json()
+        
+        required_fields = ['expenses', 'budget_goals']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        as_of = datetime.now()
+        if data.get('as_of'):
+            try:
+                # Keep the wall-clock time of offsets such as JS toISOString()'s 'Z', like expense dates
+                as_of = datetime.fromisoformat(str(data['as_of']).replace('Z', '+00:00')).replace(tzinfo=None)
+            except ValueError:
+                return jsonify({'error': f"Invalid as_of date: {data['as_of']}"}), 400
+        rules = ai_budget.ALERT_RULES + data.get('extra_rules', [])
+        if data.get('include_pace_alerts'):
+            rules = rules + [ai_budget.PACE_ALERT_RULE]
+        for rule in rules:
+            missing = [field for field in ('type', 'metric', 'threshold', 'severity') if field not in rule]
+            if missing:
+                return jsonify({'error': f'Alert rule missing fields: {missing}'}), 400
+        
+        try:
+            alerts = ai_budget.generate_alerts_batch(data['expenses'], data['budget_goals'], as_of=as_of, rules=rules)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'as_of': as_of.isoformat(),
+            'alert_count': len(alerts),
+            'alerts': alerts.to_dict('records'),
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in generate_alerts_batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/retrain-model', methods=['POST'])
 def retrain_model():
     """Retrain the model with new data"""
     try:
         data = request.get_json()
         
+        if warmup_state['status'] == 'warming':
+            return jsonify({'error': 'Model is warming up, retry shortly'}), 503, {'Retry-After': '5'}
+        
+        # Large histories are streamed from local files under TRAINING_DATA_DIR
+        if 'training_files' in data:
+            training_dir = os.path.realpath(TRAINING_DATA_DIR)
+            training_paths = []
+            for filename in data['training_files']:
+                path = os.path.realpath(os.path.join(training_dir, filename))
+                if os.path.commonpath([path, training_dir]) != training_dir:
+                    return jsonify({'error': f'Training file outside training data directory: {filename}'}), 400
+                if not os.path.isfile(path):
+                    return jsonify({'error': f'Training file not found: {filename}'}), 400
+                training_paths.append(path)
+            
+            training_results = ai_budget.train_models_from_files(
+                training_paths,
+                chunksize=data.get('chunksize', 500_000),
+                max_rows_per_stratum=data.get('max_rows_per_stratum', 20_000)
+            )
         # If custom training data is provided, use it
-        if 'training_data' in data:
+        elif 'training_data' in data:
             training_df = pd.DataFrame(data['training_data'])
             training_results = ai_budget.train_models(training_df)
         else:
@@ -363,12 +764,16 @@ def get_model_stats():
             'categories': ai_budget.categories,
             'seasonal_multipliers': ai_budget.seasonal_multipliers,
             'model_type': 'RandomForestRegressor',
+            'model_params': ai_budget.model_params,
+            'model_version': ai_budget.model_version,
             'features': [
                 'month', 'quarter', 'day_of_week', 'is_weekend',
                 'user_income', 'user_age', 'risk_tolerance', 'category',
                 'prev_month_spending', 'avg_3month_spending'
             ]
         },
+        'response_cache': response_cache.describe(),
+        'feature_store': feature_store.describe(),
         'endpoints': [
             '/api/predict-spending',
             '/api/detect-anomalies',
@@ -376,20 +781,170 @@ def get_model_stats():
             '/api/spending-trends',
             '/api/smart-insights',
             '/api/category-predictions',
+            '/api/spending-forecast',
             '/api/budget-optimization',
-            '/api/seasonal-analysis'
+            '/api/budget-optimization/batch',
+            '/api/seasonal-analysis',
+            '/api/alerts/batch',
+            '/api/expenses/ingest',
+            '/api/models'
         ],
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/expenses/ingest', methods=['POST'])
+def ingest_expenses():
+    """Record new expenses for a user and refresh their lag feature snapshot"""
+    try:
+        data = request.get_json()
+        
+        required_fields = ['user_id', 'expenses']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        expense_frame = ai_budget.normalize_expenses(data['expenses'])
+        added = feature_store.record_expenses(data['user_id'], expense_frame)
+        
+        return jsonify({
+            'success': True,
+            'user_id': data['user_id'],
+            'expenses_added': added,
+            'lag_features': feature_store.lag_features(data['user_id']),
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in ingest_expenses: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models', methods=['GET'])
+def list_models():
+    """List registered models with per-model hit counts and latency"""
+    return jsonify({
+        'success': True,
+        'default_model': model_registry.default_name,
+        'models': model_registry.list_models(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/models', methods=['POST'])
+def register_model():
+    """Register a model artifact from MODEL_ARTIFACT_DIR for lazy loading"""
+    try:
+        data = request.get_json()
+        
+        required_fields = ['name', 'version', 'artifact']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        artifact_path = _artifact_path(data['artifact'])
+        if artifact_path is None or not os.path.isfile(artifact_path):
+            return jsonify({'error': f"Model artifact not found: {data['artifact']}"}), 400
+        
+        try:
+            name, version = model_registry.register(data['name'], data['version'], artifact_path=artifact_path)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        
+        return jsonify({
+            'success': True,
+            'model': {'name': name, 'version': version},
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in register_model: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models/<name>/traffic', methods=['POST'])
+def set_model_traffic(name):
+    """Split traffic between versions of a model for A/B tests"""
+    try:
+        data = request.get_json()
+        
+        if 'weights' not in data:
+            return jsonify({'error': 'Missing required field: weights'}), 400
+        
+        model_registry.set_traffic_split(name, data['weights'])
+        
+        return jsonify({
+            'success': True,
+            'name': name,
+            'weights': data['weights'],
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except ModelNotFoundError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except Exception as e:
+        logger.error(f"Error in set_model_traffic: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _admin_authorized():
+    """Check the admin token; without one configured only loopback clients are allowed"""
+    if ADMIN_TOKEN is None:
+        return request.remote_addr in ('127.0.0.1', '::1')
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List recently saved handler profiles"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify({
+        'success': True,
+        'profiling_mode': request_profiler.mode,
+        'profiles': request_profiler.list_profiles(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """Download a saved profile (.pstats for pstats/snakeviz, .speedscope.json for speedscope)"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    path = request_profiler.profile_path(name)
+    if path is None:
+        return jsonify({'error': f'Profile not found: {name}'}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=name)
+
+def _add_profile_header(response, name):
+    """Tell the client which saved profile belongs to its request"""
+    response = make_response(response)
+    response.headers['X-Profile'] = name
+    return response
+
+# Wrap API handlers only when profiling is enabled, so it costs nothing when off
+if request_profiler.enabled:
+    for rule in app.url_map.iter_rules():
+        if rule.rule.startswith('/api/') and not rule.rule.startswith('/api/admin/'):
+            app.view_functions[rule.endpoint] = request_profiler.wrap(
+                app.view_functions[rule.endpoint], rule.endpoint, lambda: request.headers, _add_profile_header
+            )
+    logger.info(f"🔬 Request profiling enabled ({PROFILING_MODE}), saving to {request_profiler.directory}")
+
+# Time spent importing this module, before any model is loaded
+IMPORT_SECONDS = time.perf_counter() - _MODULE_STARTED
+logger.info(f"⚡ API server module imported in {IMPORT_SECONDS:.2f}s")
+
 if __name__ == '__main__':
+    # AI_BUDGET_DEBUG=0 runs without the debug reloader, e.g. for load tests
+    debug = os.environ.get('AI_BUDGET_DEBUG', '1') != '0'
+    port = int(os.environ.get('AI_BUDGET_PORT', 5000))
+    
     print("🚀 Starting AI Budget ML API Server...")
-    print("📊 Model training complete!")
+    # With the debug reloader only the serving child process loads the model
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_model_warmup()
+        print("📊 Model loading in the background, check /ready for availability")
     print("🌐 API endpoints available at:")
-    print("   • Health Check: http://localhost:5000/health")
-    print("   • Model Stats: http://localhost:5000/api/model-stats")
-    print("   • Predict Spending: http://localhost:5000/api/predict-spending")
-    print("   • Smart Insights: http://localhost:5000/api/smart-insights")
+    print(f"   • Health Check: http://localhost:{port}/health")
+    print(f"   • Readiness: http://localhost:{port}/ready")
+    print(f"   • Model Stats: http://localhost:{port}/api/model-stats")
+    print(f"   • Predict Spending: http://localhost:{port}/api/predict-spending")
+    print(f"   • Smart Insights: http://localhost:{port}/api/smart-insights")
     print("   • And more... check /api/model-stats for full list")
     
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    app.run(debug=debug, port=port, host='0.0.0.0')
@@ -0,0 +1,184 @@
+# Feature Snapshot Store for the AI Budget ML Model
+# Keeps per-user monthly spending totals in SQLite, refreshed incrementally as
+# expenses arrive, and precomputes the lag features (prev_month_spending,
+# avg_3month_spending) the spending predictor was trained with, so inference
+# can look them up by user_id instead of rescanning history on every request.
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+def current_period(now=None):
+    """Month key in the same encoding as AIBudgetManager.normalize_expenses 'period'"""
+    now = now or datetime.now()
+    return now.year * 12 + now.month - 1
+
+
+class FeatureSnapshotStore:
+    def __init__(self, path=':memory:', cache_size=10000):
+        """Configure the store; ``cache_size`` users are kept in memory
+        
+        The SQLite file is only opened (and created) on first use, so
+        constructing a store has no filesystem side effects.
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # user_id -> (as_of_period, {category: lag features})
+        self._db = None
+    
+    def _connect(self):
+        """Open the database and create the schema on first use; call with the lock held"""
+        if self._db is not None:
+            return
+        
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        if self.path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS user_monthly_spend (
+                user_id TEXT, category TEXT, period INTEGER, amount REAL,
+                PRIMARY KEY (user_id, category, period)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS user_lag_snapshot (
+                user_id TEXT, category TEXT, as_of_period INTEGER,
+                prev_month_spending REAL, avg_3month_spending REAL,
+                PRIMARY KEY (user_id, category)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS seen_expenses (
+                user_id TEXT, expense_id TEXT,
+                PRIMARY KEY (user_id, expense_id)
+            ) WITHOUT ROWID;
+        ''')
+        self._db.commit()
+    
+    def record_expenses(self, user_id, expense_frame):
+        """Add a user's new expenses and refresh the affected lag snapshots
+        
+        ``expense_frame`` is a normalized expense batch (see
+        AIBudgetManager.normalize_expenses). Expenses with an 'id' or '_id'
+        already recorded for this user are skipped, so retries do not double
+        count. Returns the number of expenses added.
+        """
+        user_id = str(user_id)
+        if len(expense_frame) == 0:
+            return 0
+        
+        with self._lock:
+            self._connect()
+            id_column = next((c for c in ('id', '_id') if c in expense_frame.columns), None)
+            if id_column is not None:
+                ids = expense_frame[id_column].astype(str)
+                seen = {
+                    row[0] for row in self._db.execute(
+                        f"SELECT expense_id FROM seen_expenses WHERE user_id = ? "
+                        f"AND expense_id IN ({','.join('?' * len(ids))})",
+                        (user_id, *ids)
+                    )
+                }
+                fresh = ~ids.isin(seen).to_numpy()
+                expense_frame = expense_frame.loc[fresh]
+                self._db.executemany(
+                    'INSERT OR IGNORE INTO seen_expenses (user_id, expense_id) VALUES (?, ?)',
+                    [(user_id, expense_id) for expense_id in ids[fresh]]
+                )
+            
+            totals = expense_frame.groupby(['category', 'period'], observed=True)['amount'].sum()
+            self._db.executemany(
+                'INSERT INTO user_monthly_spend (user_id, category, period, amount) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (user_id, category, period) DO UPDATE SET amount = amount + excluded.amount',
+                [(user_id, str(category), int(period), float(amount)) for (category, period), amount in totals.items()]
+            )
+            self._refresh_snapshot(user_id, current_period())
+            self._db.commit()
+        return len(expense_frame)
+    
+    def lag_features(self, user_id):
+        """Lag features per category for a user as of the current month
+        
+        Returns ``{category: {'prev_month_spending': x, 'avg_3month_spending': y}}``
+        (empty for unknown users). Snapshots are rebuilt lazily when the month
+        rolls over.
+        """
+        user_id = str(user_id)
+        as_of = current_period()
+        
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] == as_of:
+                self._cache.move_to_end(user_id)
+                return cached[1]
+            
+            self._connect()
+            rows = self._db.execute(
+                'SELECT category, as_of_period, prev_month_spending, avg_3month_spending '
+                'FROM user_lag_snapshot WHERE user_id = ?', (user_id,)
+            ).fetchall()
+            if any(row[1] != as_of for row in rows):
+                self._refresh_snapshot(user_id, as_of)
+                self._db.commit()
+                rows = self._db.execute(
+                    'SELECT category, as_of_period, prev_month_spending, avg_3month_spending '
+                    'FROM user_lag_snapshot WHERE user_id = ?', (user_id,)
+                ).fetchall()
+            
+            features = {
+                category: {'prev_month_spending': prev_month, 'avg_3month_spending': avg_3month}
+                for category, _, prev_month, avg_3month in rows
+            }
+            self._cache_put(user_id, as_of, features)
+            return features
+    
+    def _refresh_snapshot(self, user_id, as_of):
+        """Recompute a user's lag features from the last three completed months
+        
+        Uses the definition of AIBudgetManager._lag_features: the average of
+        the three months before ``as_of`` (months without spending count as
+        0), and 0 until the category has three months of history.
+        """
+        rows = self._db.execute(
+            'SELECT category, period, amount FROM user_monthly_spend '
+            'WHERE user_id = ? AND period >= ? AND period < ?',
+            (user_id, as_of - 3, as_of)
+        ).fetchall()
+        first_periods = dict(self._db.execute(
+            'SELECT category, MIN(period) FROM user_monthly_spend WHERE user_id = ? GROUP BY category',
+            (user_id,)
+        ).fetchall())
+        
+        recent = {}
+        for category, period, amount in rows:
+            recent.setdefault(category, {})[period] = amount
+        
+        snapshot = []
+        for category, first_period in first_periods.items():
+            months = recent.get(category, {})
+            prev_month = months.get(as_of - 1, 0.0)
+            has_three_months = first_period <= as_of - 3
+            avg_3month = sum(months.get(as_of - k, 0.0) for k in (1, 2, 3)) / 3 if has_three_months else 0.0
+            snapshot.append((user_id, category, as_of, prev_month, avg_3month))
+        
+        self._db.executemany(
+            'INSERT OR REPLACE INTO user_lag_snapshot '
+            '(user_id, category, as_of_period, prev_month_spending, avg_3month_spending) VALUES (?, ?, ?, ?, ?)',
+            snapshot
+        )
+        self._cache.pop(user_id, None)
+    
+    def _cache_put(self, user_id, as_of, features):
+        """Remember a user's snapshot, evicting the least recently used user"""
+        self._cache[user_id] = (as_of, features)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    def describe(self):
+        """Number of users and monthly rows in the store"""
+        with self._lock:
+            self._connect()
+            users, monthly_rows = self._db.execute(
+                'SELECT COUNT(DISTINCT user_id), COUNT(*) FROM user_monthly_spend'
+            ).fetchone()
+        return {'path': self.path, 'users': users, 'monthly_rows': monthly_rows, 'cached_users': len(self._cache)}
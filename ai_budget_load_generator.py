@@ -0,0 +1,425 @@
+# Load Generator for the AI Budget API server
+# Replays a realistic mix of frontend requests (predictions, category
+# predictions, insights, trends, anomaly checks, forecasts) built from
+# AIBudgetManager.generate_sample_data against a local server, either closed
+# loop (fixed concurrency) or open loop (Poisson arrivals at a fixed rate),
+# and reports throughput, latency percentiles, error rates and server CPU/RSS
+# over time as JSON and CSV for capacity planning.
+
+import argparse
+import csv
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from ai_budget_ml_model import AIBudgetManager
+
+# Share of each request type in the default mix
+DEFAULT_REQUEST_MIX = {
+    'predict-spending': 0.35,
+    'category-predictions': 0.2,
+    'smart-insights': 0.1,
+    'spending-trends': 0.15,
+    'detect-anomalies': 0.05,
+    'spending-forecast': 0.15
+}
+
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def build_user_profiles(num_users=50, num_months=6, history_months=3):
+    """Per-user profiles and expense histories from generated sample data"""
+    manager = AIBudgetManager()
+    df = manager.generate_sample_data(num_users=num_users, num_months=num_months)
+    df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'), category=df['category'].astype(str))
+    
+    profiles = []
+    for user_id, rows in df.groupby('user_id', sort=True):
+        first = rows.iloc[0]
+        expenses = rows[['date', 'category', 'amount']].assign(amount=rows['amount'].astype(float).round(2))
+        recent_start = sorted(rows['date'].unique())[-history_months:][0]
+        profiles.append({
+            'user_data': {
+                'user_id': str(user_id),
+                'user_income': round(float(first['user_income']), 2),
+                'user_age': int(first['user_age']),
+                'user_risk_tolerance': str(first['user_risk_tolerance'])
+            },
+            'expenses': expenses.to_dict('records'),
+            # Anomaly checks send only recent expenses, like the dashboard does
+            'recent_expenses': expenses.loc[expenses['date'] >= recent_start].to_dict('records'),
+            'categories': manager.categories
+        })
+    return profiles
+
+
+def build_request(kind, profile, rng):
+    """(path, body) of one request of the given kind for a user profile"""
+    user_data = profile['user_data']
+    
+    if kind == 'predict-spending':
+        return '/api/predict-spending', {**user_data, 'category': rng.choice(profile['categories'])}
+    if kind == 'category-predictions':
+        return '/api/category-predictions', dict(user_data)
+    if kind == 'smart-insights':
+        budget_goals = {category: round(rng.uniform(200, 800), -1) for category in profile['categories']}
+        return '/api/smart-insights', {
+            'user_data': user_data, 'expenses': profile['expenses'], 'budget_goals': budget_goals
+        }
+    if kind == 'spending-trends':
+        return '/api/spending-trends', {'expenses': profile['expenses']}
+    if kind == 'detect-anomalies':
+        return '/api/detect-anomalies', {'expenses': profile['recent_expenses']}
+    if kind == 'spending-forecast':
+        return '/api/spending-forecast', {**user_data, 'horizon': rng.choice([3, 6, 12])}
+    raise ValueError(f"Unknown request type: {kind}")
+
+
+class ServerMonitor:
+    """Samples CPU and RSS of the server process over time
+    
+    Uses psutil when installed and /proc otherwise; without either (or
+    without a pid) samples are recorded as None.
+    """
+    
+    def __init__(self, pid=None, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # (seconds since start, cpu percent, rss MB)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='server-monitor', daemon=True)
+        self._process = None
+        if pid is not None:
+            try:
+                import psutil
+                self._process = psutil.Process(pid)
+            except ImportError:
+                pass
+    
+    def start(self, started_at):
+        self.started_at = started_at
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def _cpu_seconds_and_rss(self):
+        """Total CPU seconds and RSS in MB of the server process"""
+        if self.pid is None:
+            return None, None
+        if self._process is not None:
+            cpu = self._process.cpu_times()
+            return cpu.user + cpu.system, self._process.memory_info().rss / 2 ** 20
+        try:
+            with open(f'/proc/{self.pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            ticks = os.sysconf('SC_CLK_TCK')
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+            rss_mb = int(fields[21]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+            return cpu_seconds, rss_mb
+        except (OSError, IndexError, ValueError):
+            return None, None
+    
+    def _run(self):
+        last_cpu, last_time = self._cpu_seconds_and_rss()[0], time.perf_counter()
+        while not self._stop.wait(self.interval):
+            cpu_seconds, rss_mb = self._cpu_seconds_and_rss()
+            now = time.perf_counter()
+            cpu_percent = None
+            if cpu_seconds is not None and last_cpu is not None:
+                cpu_percent = 100 * (cpu_seconds - last_cpu) / (now - last_time)
+            self.samples.append((now - self.started_at, cpu_percent, rss_mb))
+            last_cpu, last_time = cpu_seconds, now
+
+
+class LoadGenerator:
+    def __init__(self, base_url, profiles, request_mix=None, timeout=60, seed=42):
+        """Prepare a load run against ``base_url`` using generated user profiles"""
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.profiles = profiles
+        self.request_mix = request_mix or DEFAULT_REQUEST_MIX
+        self.timeout = timeout
+        self.seed = seed
+        self.results = []  # (seconds since start, kind, status, latency seconds, error)
+        self._results_lock = threading.Lock()
+        self._local = threading.local()
+    
+    def _requests(self, count, rng):
+        """Pre-build ``count`` (kind, path, body bytes) requests following the mix"""
+        kinds = list(self.request_mix)
+        weights = np.array([self.request_mix[kind] for kind in kinds], dtype=float)
+        chosen = rng.choices(kinds, weights=weights / weights.sum(), k=count)
+        requests = []
+        for kind in chosen:
+            path, body = build_request(kind, rng.choice(self.profiles), rng)
+            requests.append((kind, path, json.dumps(body).encode()))
+        return requests
+    
+    def _send(self, kind, path, body, scheduled_at):
+        """Send one request on this thread's keep-alive connection and record the outcome
+        
+        Latency is measured from ``scheduled_at``, so in open-loop runs time spent
+        queued behind a saturated server counts (no coordinated omission).
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        
+        status, error = None, None
+        try:
+            connection.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            error = f"{type(e).__name__}: {e}"
+            connection.close()
+            self._local.connection = None
+        
+        finished = time.perf_counter()
+        with self._results_lock:
+            self.results.append((scheduled_at - self.started_at, kind, status, finished - scheduled_at, error))
+    
+    def run_closed_loop(self, concurrency, duration):
+        """Each of ``concurrency`` clients sends its next request as soon as the last one returns"""
+        rng = random.Random(self.seed)
+        self.started_at = time.perf_counter()
+        deadline = self.started_at + duration
+        
+        def client(client_rng):
+            while time.perf_counter() < deadline:
+                kind, path, body = self._requests(1, client_rng)[0]
+                self._send(kind, path, body, time.perf_counter())
+        
+        threads = [threading.Thread(target=client, args=(random.Random(rng.random()),)) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - self.started_at
+    
+    def run_open_loop(self, rate, duration, concurrency):
+        """Send requests with Poisson arrivals at ``rate`` per second, regardless of responses
+        
+        ``concurrency`` bounds the client threads; when all are busy, requests
+        queue and their waiting time counts towards latency.
+        """
+        rng = random.Random(self.seed)
+        arrivals = np.cumsum(np.random.default_rng(self.seed).exponential(1 / rate, int(rate * duration * 1.5) + 10))
+        arrivals = arrivals[arrivals < duration]
+        requests = self._requests(len(arrivals), rng)
+        
+        self.started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as pool:
+            for offset, (kind, path, body) in zip(arrivals, requests):
+                scheduled_at = self.started_at + offset
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._send, kind, path, body, scheduled_at)
+        return time.perf_counter() - self.started_at
+
+
+def _latency_summary(latencies):
+    """Latency percentiles in milliseconds"""
+    if len(latencies) == 0:
+        return {f'p{p}': None for p in LATENCY_PERCENTILES} | {'mean': None, 'max': None}
+    latencies = np.asarray(latencies) * 1000
+    summary = {f'p{p}': float(np.percentile(latencies, p)) for p in LATENCY_PERCENTILES}
+    summary.update(mean=float(latencies.mean()), max=float(latencies.max()))
+    return summary
+
+
+def build_report(results, elapsed, monitor_samples, config, warmup=0.0):
+    """Summarize recorded requests, overall, per request type and per second"""
+    measured = [r for r in results if r[0] >= warmup]
+    
+    def summarize(rows, seconds):
+        errors = sum(1 for r in rows if r[4] is not None or r[2] is None or r[2] >= 500)
+        rejected = sum(1 for r in rows if r[2] is not None and 400 <= r[2] < 500)
+        return {
+            'requests': len(rows),
+            'throughput_rps': len(rows) / seconds if seconds > 0 else None,
+            'error_rate': errors / len(rows) if rows else 0.0,
+            'client_error_rate': rejected / len(rows) if rows else 0.0,
+            'latency_ms': _latency_summary([r[3] for r in rows])
+        }
+    
+    measured_seconds = max(elapsed - warmup, 1e-9)
+    by_kind = {}
+    for row in measured:
+        by_kind.setdefault(row[1], []).append(row)
+    
+    status_counts = {}
+    for row in measured:
+        key = str(row[2]) if row[2] is not None else 'connection_error'
+        status_counts[key] = status_counts.get(key, 0) + 1
+    
+    # One timeline row per second of the run; requests and samples are bucketed once
+    results_by_second = {}
+    for row in results:
+        results_by_second.setdefault(int(row[0]), []).append(row)
+    samples_by_second = {}
+    for sample in monitor_samples:
+        # A sample at time t covers the second ending at t
+        samples_by_second.setdefault(int(np.ceil(sample[0])) - 1, []).append(sample)
+    
+    timeline = []
+    for second in range(int(np.ceil(elapsed))):
+        rows = results_by_second.get(second, [])
+        samples = samples_by_second.get(second, [])
+        cpu = [s[1] for s in samples if s[1] is not None]
+        rss = [s[2] for s in samples if s[2] is not None]
+        latency = _latency_summary([r[3] for r in rows])
+        timeline.append({
+            'second': second,
+            'requests': len(rows),
+            'errors': sum(1 for r in rows if r[4] is not None or r[2] is None or r[2] >= 500),
+            'latency_p50_ms': latency['p50'],
+            'latency_p95_ms': latency['p95'],
+            'server_cpu_percent': float(np.mean(cpu)) if cpu else None,
+            'server_rss_mb': float(max(rss)) if rss else None
+        })
+    
+    rss_samples = [s[2] for s in monitor_samples if s[2] is not None]
+    cpu_samples = [s[1] for s in monitor_samples if s[1] is not None]
+    return {
+        'config': config,
+        'elapsed_seconds': elapsed,
+        'warmup_seconds': warmup,
+        'overall': summarize(measured, measured_seconds),
+        'by_request_type': {kind: summarize(rows, measured_seconds) for kind, rows in sorted(by_kind.items())},
+        'status_counts': status_counts,
+        'errors': sorted({r[4] for r in measured if r[4] is not None})[:20],
+        'server': {
+            'cpu_percent_mean': float(np.mean(cpu_samples)) if cpu_samples else None,
+            'cpu_percent_max': float(np.max(cpu_samples)) if cpu_samples else None,
+            'rss_mb_max': float(np.max(rss_samples)) if rss_samples else None
+        },
+        'timeline': timeline,
+        'generated_at': datetime.now().isoformat()
+    }
+
+
+def write_timeline_csv(report, path):
+    """Write the per-second timeline of a report as CSV"""
+    timeline = report['timeline']
+    if not timeline:
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(timeline[0]))
+        writer.writeheader()
+        writer.writerows(timeline)
+
+
+def start_server(port, ready_timeout=300):
+    """Start ai_budget_api_server.py on ``port`` without the debug reloader and wait until ready"""
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_budget_api_server.py')
+    env = {**os.environ, 'AI_BUDGET_PORT': str(port), 'AI_BUDGET_DEBUG': '0'}
+    process = subprocess.Popen([sys.executable, server_path], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    deadline = time.time() + ready_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/ready')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"API server was not ready within {ready_timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a realistic request mix against the AI Budget API server")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="Base URL of a running server")
+    parser.add_argument('--start-server', action='store_true', help="Start a local server on --port for the run")
+    parser.add_argument('--port', type=int, default=5055, help="Port for --start-server")
+    parser.add_argument('--server-pid', type=int, default=None, help="Pid of a running server to sample CPU/RSS from")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+                        help="closed: fixed number of clients; open: Poisson arrivals at --rate")
+    parser.add_argument('--concurrency', type=int, default=8, help="Clients (closed) or maximum in-flight requests (open)")
+    parser.add_argument('--rate', type=float, default=20.0, help="Arrivals per second in open-loop mode")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument('--warmup', type=float, default=0.0, help="Leading seconds excluded from the summary")
+    parser.add_argument('--users', type=int, default=50, help="Generated user profiles")
+    parser.add_argument('--months', type=int, default=6, help="Months of expense history per user")
+    parser.add_argument('--mix', default=None, help="JSON request mix, e.g. '{\"predict-spending\": 1}'")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='ai_budget_load_report.json', help="JSON report path")
+    parser.add_argument('--csv', default='ai_budget_load_timeline.csv', help="Per-second timeline CSV path")
+    args = parser.parse_args()
+    
+    np.random.seed(args.seed)
+    request_mix = json.loads(args.mix) if args.mix else DEFAULT_REQUEST_MIX
+    unknown = set(request_mix) - set(DEFAULT_REQUEST_MIX)
+    if unknown:
+        parser.error(f"Unknown request types in --mix: {sorted(unknown)}")
+    
+    print(f"🔄 Building request mix for {args.users} users...")
+    profiles = build_user_profiles(args.users, args.months)
+    
+    server = None
+    base_url, server_pid = args.url, args.server_pid
+    if args.start_server:
+        print(f"🚀 Starting API server on port {args.port}...")
+        server = start_server(args.port)
+        base_url, server_pid = f'http://127.0.0.1:{args.port}', server.pid
+    
+    try:
+        generator = LoadGenerator(base_url, profiles, request_mix, seed=args.seed)
+        monitor = ServerMonitor(server_pid)
+        monitor.start(time.perf_counter())
+        
+        if args.mode == 'closed':
+            print(f"📈 Closed loop: {args.concurrency} clients for {args.duration:.0f}s against {base_url}")
+            elapsed = generator.run_closed_loop(args.concurrency, args.duration)
+        else:
+            print(f"📈 Open loop: {args.rate:.1f} req/s for {args.duration:.0f}s against {base_url}")
+            elapsed = generator.run_open_loop(args.rate, args.duration, args.concurrency)
+        monitor.stop()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    
+    # Monitor times are relative to its own start; align them with the load run
+    offset = generator.started_at - monitor.started_at
+    samples = [(t - offset, cpu, rss) for t, cpu, rss in monitor.samples]
+    config = {**vars(args), 'request_mix': request_mix, 'base_url': base_url}
+    report = build_report(generator.results, elapsed, samples, config, warmup=args.warmup)
+    
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    write_timeline_csv(report, args.csv)
+    
+    overall = report['overall']
+    print(f"✅ {overall['requests']} requests, {overall['throughput_rps']:.1f} req/s, "
+          f"error rate {overall['error_rate']:.2%}")
+    print(f"   • Latency p50 {overall['latency_ms']['p50'] or 0:.1f}ms, "
+          f"p95 {overall['latency_ms']['p95'] or 0:.1f}ms, p99 {overall['latency_ms']['p99'] or 0:.1f}ms")
+    if report['server']['rss_mb_max'] is not None:
+        print(f"   • Server CPU {report['server']['cpu_percent_mean']:.0f}% mean, "
+              f"RSS {report['server']['rss_mb_max']:.0f} MB peak")
+    print(f"📄 Report written to {args.output} and {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
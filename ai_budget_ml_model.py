@@ -1,35 +1,118 @@
 # AI Budget Management ML Model
 # This model provides intelligent budget recommendations, spending predictions, and financial insights
 
-import pandas as pd
+import calendar
+import importlib.util
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, IsolationForest
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
 import json
+import sys
+import time
+import types
+import uuid
 from datetime import datetime, timedelta
 import warnings
+from dataclasses import dataclass
 warnings.filterwarnings('ignore')
 
+
+class _LazyModule(types.ModuleType):
+    """Stand-in for a module that imports it on first attribute access"""
+    
+    def __getattr__(self, attr):
+        # A real import under the interpreter's import lock, so threads touching
+        # the module for the first time at once (e.g. the model warm-up and a
+        # request) all see it fully initialized
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """Import a module whose body only runs on first attribute access
+    
+    Keeps heavy dependencies such as pandas off the startup path. scikit-learn
+    is imported inside the methods that need it instead.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named {name!r}")
+    return _LazyModule(name)
+
+
+pd = lazy_import('pandas')
+
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """Trained state of an AIBudgetManager, published as a whole
+    
+    Readers take ``snap = manager._snapshot`` once and use only that object, so
+    a concurrent retrain or load can never mix a new scaler with an old forest.
+    Writers fit fresh models and publish them with a single reference swap;
+    the models inside a published snapshot are never modified.
+    """
+    spending_predictor: object = None
+    anomaly_detector: object = None
+    trend_analyzer: object = None
+    scaler: object = None
+    category_encoder: object = None
+    feature_names: tuple = ()
+    categories: tuple = ()
+    model_version: str = None  # Changes whenever the model is retrained
+    is_trained: bool = False
+
+
 class AIBudgetManager:
-    def __init__(self):
-        """Initialize the AI Budget Manager with ML models"""
-        self.spending_predictor = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.anomaly_detector = IsolationForest(contamination=0.1, random_state=42)
-        self.trend_analyzer = LinearRegression()
-        self.category_encoder = LabelEncoder()
-        self.scaler = StandardScaler()
-        self.is_trained = False
-        self.feature_names = []  # Store feature names for consistency
-        
-        # Budget categories
-        self.categories = [
+    # Column layout expected by train_models_from_files: one row per user, category and month.
+    # Compact dtypes as in generate_sample_data; user ids keep full width.
+    TRAINING_SCHEMA = {
+        'user_id': 'int64',
+        'date': 'datetime64[ns]',
+        'category': 'category',
+        'amount': 'float32',
+        'user_income': 'float32',
+        'user_age': 'int8',
+        'user_risk_tolerance': 'category'
+    }
+    
+    # Relative weights for budget category priorities
+    PRIORITY_WEIGHTS = {'low': 1.0, 'medium': 2.0, 'high': 3.0}
+    
+    # Budget alert rules in priority order; each (user, category) gets the first rule it exceeds.
+    # Metrics: spent, budget, remaining, percentage, projected_percentage (month-end pace)
+    ALERT_RULES = [
+        {'type': 'budget_exceeded', 'metric': 'percentage', 'threshold': 90, 'severity': 'high'},
+        {'type': 'budget_warning', 'metric': 'percentage', 'threshold': 75, 'severity': 'medium'}
+    ]
+    
+    # Optional extra rule: on pace to overspend the budget by the end of the month
+    PACE_ALERT_RULE = {
+        'type': 'budget_pace', 'metric': 'projected_percentage', 'threshold': 100, 'severity': 'low',
+        'message': "At this pace you'll spend {projected_percentage:.0f}% of your {category} budget this month"
+    }
+    
+    ALERT_MESSAGE = "You've spent {percentage:.1f}% of your {category} budget"
+    
+    # Hyperparameters of the ML models; tuned values come from ai_budget_model_tuning
+    DEFAULT_MODEL_PARAMS = {
+        'n_estimators': 100,
+        'max_depth': None,
+        'contamination': 0.1
+    }
+    
+    def __init__(self, model_params=None):
+        """Initialize the AI Budget Manager; ML models are created when training starts"""
+        self.model_params = {**self.DEFAULT_MODEL_PARAMS, **(model_params or {})}
+        self.feature_store = None  # Optional FeatureSnapshotStore for per-user lag features
+        
+        # Untrained state with the default budget categories; replaced by training or loading
+        self._snapshot = ModelSnapshot(categories=(
             'food', 'transport', 'shopping', 'entertainment', 'utilities',
             'healthcare', 'education', 'travel', 'business', 'other'
-        ]
+        ))
         
         # Seasonal patterns
         self.seasonal_multipliers = {
@@ -47,105 +130,232 @@ class AIBudgetManager:
             12: 1.4   # December - Christmas, New Year
         }
     
+    # Read-only views of the current snapshot, for callers that need a single field
+    @property
+    def spending_predictor(self):
+        return self._snapshot.spending_predictor
+    
+    @property
+    def anomaly_detector(self):
+        return self._snapshot.anomaly_detector
+    
+    @property
+    def trend_analyzer(self):
+        return self._snapshot.trend_analyzer
+    
+    @property
+    def scaler(self):
+        return self._snapshot.scaler
+    
+    @property
+    def category_encoder(self):
+        return self._snapshot.category_encoder
+    
+    @property
+    def feature_names(self):
+        return list(self._snapshot.feature_names)
+    
+    @property
+    def categories(self):
+        return list(self._snapshot.categories)
+    
+    @property
+    def model_version(self):
+        return self._snapshot.model_version
+    
+    @property
+    def is_trained(self):
+        return self._snapshot.is_trained
+    
     def generate_sample_data(self, num_users=100, num_months=12):
-        """Generate realistic sample expense data for training"""
+        """Generate realistic sample expense data for training
+        
+        Rows are built column by column with compact dtypes: categorical
+        category and risk tolerance, float32 amounts and small integer
+        calendar fields.
+        """
         print("🔄 Generating sample training data...")
         
-        data = []
         base_date = datetime.now() - timedelta(days=365)
-        
-        for user_id in range(1, num_users + 1):
-            # User characteristics
-            user_income = np.random.normal(5000, 1500)  # Monthly income
-            user_age = np.random.randint(18, 65)
-            user_risk_tolerance = np.random.choice(['low', 'medium', 'high'])
-            
-            for month in range(num_months):
-                current_date = base_date + timedelta(days=30 * month)
-                month_num = current_date.month
-                
-                # Generate expenses for each category
-                for category in self.categories:
-                    # Base spending amount based on category
-                    base_amounts = {
-                        'food': 400, 'transport': 200, 'shopping': 300,
-                        'entertainment': 150, 'utilities': 200, 'healthcare': 100,
-                        'education': 50, 'travel': 100, 'business': 75, 'other': 100
-                    }
-                    
-                    base_amount = base_amounts.get(category, 100)
-                    
-                    # Apply seasonal multiplier
-                    seasonal_amount = base_amount * self.seasonal_multipliers[month_num]
-                    
-                    # Add user-specific variation
-                    income_factor = user_income / 5000  # Normalize to median income
-                    age_factor = 1 + (user_age - 40) / 100  # Age affects spending
-                    
-                    # Generate monthly spending with realistic variation
-                    monthly_spending = seasonal_amount * income_factor * age_factor
-                    monthly_spending *= np.random.normal(1, 0.3)  # Add randomness
-                    monthly_spending = max(0, monthly_spending)  # No negative spending
-                    
-                    # Generate number of transactions
-                    num_transactions = max(1, int(np.random.poisson(10)))
-                    
-                    data.append({
-                        'user_id': user_id,
-                        'date': current_date,
-                        'month': month_num,
-                        'category': category,
-                        'amount': monthly_spending,
-                        'num_transactions': num_transactions,
-                        'user_income': user_income,
-                        'user_age': user_age,
-                        'user_risk_tolerance': user_risk_tolerance,
-                        'day_of_week': current_date.weekday(),
-                        'is_weekend': current_date.weekday() >= 5,
-                        'quarter': (month_num - 1) // 3 + 1
-                    })
-        
-        df = pd.DataFrame(data)
+        num_categories = len(self.categories)
+        rows_per_user = num_months * num_categories
+        num_rows = num_users * rows_per_user
+        
+        # User characteristics
+        user_income = np.random.normal(5000, 1500, num_users)  # Monthly income
+        user_age = np.random.randint(18, 65, num_users)
+        risk_levels = ['low', 'medium', 'high']
+        user_risk_tolerance = np.random.randint(0, len(risk_levels), num_users)
+        
+        # Calendar of the generated months
+        month_dates = pd.DatetimeIndex([base_date + timedelta(days=30 * month) for month in range(num_months)])
+        month_nums = month_dates.month.to_numpy()
+        seasonal = np.array([self.seasonal_multipliers[month] for month in month_nums])
+        
+        # Row layout: user -> month -> category
+        user_index = np.repeat(np.arange(num_users), rows_per_user)
+        month_index = np.tile(np.repeat(np.arange(num_months), num_categories), num_users)
+        category_index = np.tile(np.arange(num_categories), num_users * num_months)
+        
+        # Base spending amount based on category
+        base_amounts = {
+            'food': 400, 'transport': 200, 'shopping': 300,
+            'entertainment': 150, 'utilities': 200, 'healthcare': 100,
+            'education': 50, 'travel': 100, 'business': 75, 'other': 100
+        }
+        base_amount = np.array([base_amounts.get(category, 100) for category in self.categories])
+        
+        # Seasonal, income and age effects with realistic random variation
+        income_factor = user_income / 5000  # Normalize to median income
+        age_factor = 1 + (user_age - 40) / 100  # Age affects spending
+        monthly_spending = (base_amount[category_index] * seasonal[month_index]
+                            * income_factor[user_index] * age_factor[user_index]
+                            * np.random.normal(1, 0.3, num_rows))
+        monthly_spending = np.maximum(0, monthly_spending)  # No negative spending
+        
+        # Generate number of transactions
+        num_transactions = np.maximum(1, np.random.poisson(10, num_rows))
+        
+        day_of_week = month_dates.dayofweek.to_numpy()[month_index]
+        df = pd.DataFrame({
+            'user_id': (user_index + 1).astype(np.int32),
+            'date': month_dates[month_index],
+            'month': month_nums[month_index].astype(np.int8),
+            'category': pd.Categorical.from_codes(category_index, categories=self.categories),
+            'amount': monthly_spending.astype(np.float32),
+            'num_transactions': num_transactions.astype(np.int16),
+            'user_income': user_income[user_index].astype(np.float32),
+            'user_age': user_age[user_index].astype(np.int8),
+            'user_risk_tolerance': pd.Categorical.from_codes(user_risk_tolerance[user_index], categories=risk_levels),
+            'day_of_week': day_of_week.astype(np.int8),
+            'is_weekend': day_of_week >= 5,
+            'quarter': ((month_nums[month_index] - 1) // 3 + 1).astype(np.int8)
+        })
         print(f"✅ Generated {len(df)} expense records for training")
         return df
     
     def prepare_features(self, df):
-        """Prepare features for machine learning models"""
-        print("🔄 Preparing features for ML models...")
-        
-        # Create feature matrix
-        features = pd.DataFrame()
-        
-        # Time-based features
-        features['month'] = df['month']
-        features['quarter'] = df['quarter']
-        features['day_of_week'] = df['day_of_week']
-        features['is_weekend'] = df['is_weekend'].astype(int)
+        """Prepare features for machine learning models
         
-        # User features
-        features['user_income'] = df['user_income']
-        features['user_age'] = df['user_age']
-        
-        # Encode categorical variables
-        risk_tolerance_encoded = pd.get_dummies(df['user_risk_tolerance'], prefix='risk')
-        category_encoded = pd.get_dummies(df['category'], prefix='cat')
+        Features come back as one C-contiguous float32 block wrapped in a
+        DataFrame, so ``features.to_numpy()`` hands sklearn the matrix without
+        another copy.
+        """
+        print("🔄 Preparing features for ML models...")
         
-        features = pd.concat([features, risk_tolerance_encoded, category_encoded], axis=1)
+        source = df
+        df = self.normalize_expenses(df)
         
-        # Historical spending features (rolling averages)
-        df_sorted = df.sort_values(['user_id', 'date'])
-        features['prev_month_spending'] = df_sorted.groupby(['user_id', 'category'])['amount'].shift(1).fillna(0)
-        features['avg_3month_spending'] = df_sorted.groupby(['user_id', 'category'])['amount'].rolling(3).mean().fillna(0).values
+        # Time, user, one-hot and historical spending features
+        features = self._feature_matrix(df, self._lag_features(df))
         
         # Target variable
         target = df['amount']
         
-        # Store feature names for consistency in predictions
-        self.feature_names = list(features.columns)
-        
-        print(f"✅ Prepared {features.shape[1]} features")
+        # Report on the frame as passed in, not the normalized copy with its extra columns
+        memory = self.memory_report(source, features)
+        frame_ratio = memory['frame_savings_ratio']
+        frame_comparison = (f"{frame_ratio:.1f}x smaller than" if frame_ratio >= 1.05
+                            else f"{1 / frame_ratio:.1f}x larger than" if frame_ratio <= 0.95
+                            else "about the same size as")
+        print(f"✅ Prepared {features.shape[1]} features "
+              f"({memory['feature_matrix_mb']:.1f} MB float32, {memory['feature_savings_ratio']:.1f}x smaller "
+              f"than float64; training frame {memory['training_frame_mb']:.1f} MB, "
+              f"{frame_comparison} object/64-bit columns)")
         return features, target
     
+    def _feature_matrix(self, df, lag_features):
+        """Write all model features straight into one float32 matrix"""
+        # Encode categorical variables with a fixed column set so that every
+        # chunk or sample of the data produces the same feature layout
+        risk_codes = pd.Categorical(df['user_risk_tolerance'], categories=['high', 'low', 'medium']).codes
+        category_names = sorted(self.categories)
+        category_codes = pd.Categorical(df['category'], categories=category_names).codes
+        
+        columns = {
+            # Time-based features
+            'month': df['month'],
+            'quarter': df['quarter'],
+            'day_of_week': df['day_of_week'],
+            'is_weekend': df['day_of_week'] >= 5,
+            # User features
+            'user_income': df['user_income'],
+            'user_age': df['user_age'],
+            **{f'risk_{level}': risk_codes == i for i, level in enumerate(['high', 'low', 'medium'])},
+            **{f'cat_{category}': category_codes == i for i, category in enumerate(category_names)},
+            # Historical spending features
+            'prev_month_spending': lag_features['prev_month_spending'],
+            'avg_3month_spending': lag_features['avg_3month_spending']
+        }
+        
+        matrix = np.empty((len(df), len(columns)), dtype=np.float32)
+        for i, values in enumerate(columns.values()):
+            matrix[:, i] = values
+        return pd.DataFrame(matrix, index=df.index, columns=list(columns), copy=False)
+    
+    @staticmethod
+    def _lag_features(df):
+        """Previous-month and 3-month average spending per user and category
+        
+        Both look only at earlier calendar months of the same (user_id,
+        category) series, found by ``period``: the previous month's total and
+        the mean of the three months before each row, with months without
+        spending counted as 0. The average stays 0 until the series' first
+        month is at least three months back. This is the definition
+        FeatureSnapshotStore serves at inference. The result is aligned to
+        ``df.index``.
+        """
+        user_codes = pd.factorize(df['user_id'])[0].astype(np.int64)
+        category_codes = pd.factorize(df['category'])[0].astype(np.int64)
+        periods = df['period'].to_numpy(dtype=np.int64)
+        series = (user_codes << 16) | category_codes
+        keys = (series << 16) | periods
+        
+        # Monthly totals per series, looked up by (series, period - k)
+        monthly = pd.Series(df['amount'].to_numpy(dtype=np.float64)).groupby(keys).sum()
+        month_keys, month_totals = monthly.index.to_numpy(), monthly.to_numpy()
+        prev = np.empty((3, len(keys)))
+        for k in (1, 2, 3):
+            position = np.minimum(np.searchsorted(month_keys, keys - k), len(month_keys) - 1)
+            prev[k - 1] = np.where(month_keys[position] == keys - k, month_totals[position], 0.0)
+        
+        first_periods = pd.Series(periods).groupby(series).transform('min').to_numpy()
+        lags = np.empty((len(keys), 2), dtype=np.float32)
+        lags[:, 0] = prev[0]
+        lags[:, 1] = np.where(first_periods <= periods - 3, prev.sum(axis=0) / 3, 0.0)
+        return pd.DataFrame(lags, index=df.index, columns=['prev_month_spending', 'avg_3month_spending'])
+    
+    @staticmethod
+    def memory_report(df, features=None):
+        """Memory of a training frame and feature matrix versus object/64-bit equivalents"""
+        frame_bytes = df.memory_usage(deep=True).sum()
+        
+        # What the same data costs as Python strings and 64-bit numbers
+        wide_bytes = df.index.memory_usage()
+        for name in df.columns:
+            column = df[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                string_bytes = np.array([sys.getsizeof(str(c)) for c in column.cat.categories])
+                counts = np.bincount(column.cat.codes[column.cat.codes >= 0], minlength=len(string_bytes))
+                wide_bytes += 8 * len(column) + int(string_bytes @ counts)
+            elif column.dtype == object or pd.api.types.is_string_dtype(column.dtype):
+                wide_bytes += column.memory_usage(deep=True, index=False)
+            else:
+                wide_bytes += 8 * len(column)
+        
+        report = {
+            'training_frame_mb': float(frame_bytes / 2 ** 20),
+            'frame_savings_ratio': float(wide_bytes / frame_bytes) if frame_bytes else 1.0,
+            'peak_rss_mb': AIBudgetManager._peak_rss_mb()
+        }
+        if features is not None:
+            feature_bytes = features.memory_usage(index=False).sum()
+            report.update({
+                'feature_matrix_mb': float(feature_bytes / 2 ** 20),
+                'feature_savings_ratio': float(8 * features.size / feature_bytes) if feature_bytes else 1.0
+            })
+        return report
+    
     def train_models(self, df=None):
         """Train all ML models with expense data"""
         print("🚀 Starting AI Budget Manager training...")
@@ -155,29 +365,184 @@ class AIBudgetManager:
         
         # Prepare features
         X, y = self.prepare_features(df)
+        results = self._fit_models(X, y)
+        results['memory'] = self.memory_report(df, X)
+        return results
+    
+    def train_models_from_files(self, paths, chunksize=500_000, max_rows_per_stratum=20_000,
+                                stratify_by=('category',), random_state=42):
+        """Train from chunked CSV/Parquet expense history without loading it all into memory
+        
+        Each file must follow ``TRAINING_SCHEMA``: one row per user, category and
+        month, in chronological order. Lag features are computed in a single
+        streaming pass (see ``_iter_lagged_chunks``), and a uniform sample of at
+        most ``max_rows_per_stratum`` rows is kept for each ``stratify_by``
+        group (bottom-k sampling on random keys, equivalent to a reservoir).
+        """
+        print("🚀 Starting out-of-core AI Budget Manager training...")
+        
+        if isinstance(paths, str):
+            paths = [paths]
+        
+        rng = np.random.default_rng(random_state)
+        strata = list(stratify_by)
+        sample = None
+        rows_read = 0
+        started = time.perf_counter()
+        
+        for fresh in self._iter_lagged_chunks(self._iter_training_chunks(paths, chunksize)):
+            rows_read += len(fresh)
+            
+            # Bottom-k on uniform keys keeps a uniform sample of each stratum
+            fresh = fresh.assign(_sample_key=rng.random(len(fresh)))
+            sample = fresh if sample is None else self._concat_frames([sample, fresh])
+            sample = (sample.sort_values('_sample_key', kind='stable')
+                      .groupby(strata, sort=False, observed=True)
+                      .head(max_rows_per_stratum)
+                      .reset_index(drop=True))
+            
+            print(f"   • Streamed {rows_read} rows, sample holds {len(sample)}")
+        
+        if sample is None or sample.empty:
+            raise ValueError("No training rows found in the given files")
+        
+        ingest_seconds = time.perf_counter() - started
+        ingest_stats = {
+            'rows_read': rows_read,
+            'rows_sampled': len(sample),
+            'ingest_seconds': ingest_seconds,
+            'rows_per_second': rows_read / ingest_seconds if ingest_seconds > 0 else float(rows_read),
+            'peak_rss_mb': self._peak_rss_mb()
+        }
+        
+        print("🔄 Preparing features for ML models...")
+        X = self._feature_matrix(sample, sample)
+        
+        results = self._fit_models(X, sample['amount'])
+        results['ingest'] = ingest_stats
+        results['memory'] = self.memory_report(sample, X)
+        print(f"📦 Ingested {rows_read} rows at {ingest_stats['rows_per_second']:.0f} rows/s")
+        if ingest_stats['peak_rss_mb'] is not None:
+            print(f"   • Peak RSS {ingest_stats['peak_rss_mb']:.1f} MB")
+        return results
+    
+    def _iter_lagged_chunks(self, chunks):
+        """Normalize chronological expense chunks and join their lag features
+        
+        Each chunk is processed together with the rows carried over from
+        earlier chunks: the first month of every (user_id, category) series
+        (for the 3-month warm-up) and its last four months, which is all a
+        later row can look back to. Yields the chunk's own rows only.
+        """
+        carry = None
+        for chunk in chunks:
+            chunk = self.normalize_expenses(chunk)
+            chunk['_carry'] = False
+            
+            combined = chunk if carry is None else self._concat_frames([carry, chunk])
+            combined = combined.join(self._lag_features(combined))
+            
+            periods = combined.groupby(['user_id', 'category'], sort=False, observed=True)['period']
+            keep = ((combined['period'] >= periods.transform('max') - 3)
+                    | (combined['period'] == periods.transform('min')))
+            carry = combined.loc[keep, list(chunk.columns)].assign(_carry=True)
+            
+            yield combined.loc[~combined['_carry']].drop(columns='_carry')
+    
+    @staticmethod
+    def _concat_frames(frames):
+        """Concatenate frames, keeping categorical columns categorical when their categories differ"""
+        for name, dtype in frames[0].dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                categories = dtype.categories
+                for frame in frames[1:]:
+                    categories = categories.union(frame[name].cat.categories)
+                frames = [frame.assign(**{name: frame[name].cat.set_categories(categories)}) for frame in frames]
+        return pd.concat(frames, ignore_index=True)
+    
+    def _iter_training_chunks(self, paths, chunksize):
+        """Yield DataFrame chunks with the training schema from CSV or Parquet files"""
+        columns = list(self.TRAINING_SCHEMA)
+        
+        for path in paths:
+            if str(path).endswith(('.parquet', '.pq')):
+                try:
+                    import pyarrow.parquet as pq
+                except ImportError:
+                    raise ImportError("Reading Parquet training files requires pyarrow (pip install pyarrow)")
+                
+                parquet_file = pq.ParquetFile(path)
+                for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+                    yield batch.to_pandas().astype(self.TRAINING_SCHEMA)
+            else:
+                csv_dtypes = {k: v for k, v in self.TRAINING_SCHEMA.items() if k != 'date'}
+                yield from pd.read_csv(path, usecols=columns, dtype=csv_dtypes, chunksize=chunksize)
+    
+    @staticmethod
+    def _peak_rss_mb():
+        """Peak resident set size of this process in MB, or None where unsupported"""
+        try:
+            import resource
+        except ImportError:
+            return None
+        
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    
+    def _build_models(self):
+        """Create fresh untrained ML models, importing scikit-learn on first use"""
+        from sklearn.ensemble import RandomForestRegressor, IsolationForest
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
+        
+        return {
+            'spending_predictor': RandomForestRegressor(
+                n_estimators=self.model_params['n_estimators'],
+                max_depth=self.model_params['max_depth'],
+                random_state=42
+            ),
+            'anomaly_detector': IsolationForest(contamination=self.model_params['contamination'], random_state=42),
+            'trend_analyzer': LinearRegression(),
+            'category_encoder': LabelEncoder(),
+            'scaler': StandardScaler()
+        }
+    
+    def _fit_models(self, X, y):
+        """Fit and evaluate all models on a prepared feature matrix"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+        
+        # Fit new models off to the side; readers keep using the current snapshot
+        models = self._build_models()
+        feature_names = list(X.columns)
+        X_values = X.to_numpy(dtype=np.float32)
+        y_values = np.asarray(y, dtype=np.float32)
+        
+        # Split data; row selection makes the only copies of the feature matrix
+        train_index, test_index = train_test_split(np.arange(len(X_values)), test_size=0.2, random_state=42)
+        X_train, X_test = X_values[train_index], X_values[test_index]
+        y_train, y_test = y_values[train_index], y_values[test_index]
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        print("🔄 Training trend analysis model...")
+        # Train trend analyzer (simplified for demo) on unscaled features
+        trend_columns = [feature_names.index(name) for name in ['month', 'user_income', 'user_age']]
+        models['trend_analyzer'].fit(X_train[:, trend_columns].astype(np.float64), y_train)
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        # Scale features in place; float32 C-contiguous input is used by the forests as is
+        X_train_scaled = models['scaler'].fit(X_train).transform(X_train, copy=False)
+        X_test_scaled = models['scaler'].transform(X_test, copy=False)
         
         print("🔄 Training spending prediction model...")
         # Train spending predictor
-        self.spending_predictor.fit(X_train_scaled, y_train)
+        models['spending_predictor'].fit(X_train_scaled, y_train)
         
         print("🔄 Training anomaly detection model...")
         # Train anomaly detector
-        self.anomaly_detector.fit(X_train_scaled)
-        
-        print("🔄 Training trend analysis model...")
-        # Train trend analyzer (simplified for demo)
-        trend_features = X_train[['month', 'user_income', 'user_age']].values
-        self.trend_analyzer.fit(trend_features, y_train)
+        models['anomaly_detector'].fit(X_train_scaled)
         
         # Evaluate models
-        y_pred = self.spending_predictor.predict(X_test_scaled)
+        y_pred = models['spending_predictor'].predict(X_test_scaled)
         mae = mean_absolute_error(y_test, y_pred)
         rmse = np.sqrt(mean_squared_error(y_test, y_pred))
         r2 = r2_score(y_test, y_pred)
@@ -188,27 +553,35 @@ class AIBudgetManager:
         print(f"   • Root Mean Square Error: ${rmse:.2f}")
         print(f"   • R² Score: {r2:.3f}")
         
-        self.is_trained = True
+        # Publish the trained models with one atomic reference swap
+        self._snapshot = ModelSnapshot(
+            **models,
+            feature_names=tuple(feature_names),
+            categories=self._snapshot.categories,
+            model_version=f"{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}",
+            is_trained=True
+        )
         return {
             'mae': mae,
             'rmse': rmse,
             'r2': r2,
-            'feature_importance': dict(zip(X.columns, self.spending_predictor.feature_importances_))
+            'feature_importance': dict(zip(feature_names, models['spending_predictor'].feature_importances_))
         }
     
     def predict_spending(self, user_data):
         """Predict future spending for a user"""
-        if not self.is_trained:
+        snap = self._snapshot
+        if not snap.is_trained:
             print("❌ Model not trained yet. Please call train_models() first.")
             return None
         
         # Prepare features from user data
-        features = self._prepare_user_features(user_data)
-        features_scaled = self.scaler.transform([features])
+        features = self._prepare_user_features(user_data, snap)
+        features_scaled = snap.scaler.transform([features])
         
         # Predict spending
-        predicted_amount = self.spending_predictor.predict(features_scaled)[0]
-        confidence = self._calculate_prediction_confidence(features_scaled)
+        predicted_amount = snap.spending_predictor.predict(features_scaled)[0]
+        confidence = self._calculate_prediction_confidence(features_scaled, snap)
         
         return {
             'predicted_amount': max(0, predicted_amount),
@@ -216,50 +589,110 @@ class AIBudgetManager:
             'category': user_data.get('category', 'other')
         }
     
-    def detect_anomalies(self, user_expenses):
-        """Detect unusual spending patterns"""
-        if not self.is_trained:
+    def predict_categories(self, user_data, snap=None):
+        """Predict one user's spending in every category in one model pass
+        
+        All categories come from the same snapshot, so a concurrent retrain
+        never mixes two models in one answer. Returns ``{category:
+        prediction}`` with the fields of ``predict_spending`` (empty if the
+        model is not trained).
+        """
+        snap = snap or self._snapshot
+        if not snap.is_trained:
+            return {}
+        
+        records = pd.DataFrame([{**user_data, 'category': category} for category in snap.categories])
+        predicted, confidence = self._predict_batch(records, snap)
+        return {
+            category: {'predicted_amount': float(amount), 'confidence': float(score), 'category': category}
+            for category, amount, score in zip(snap.categories, predicted, confidence)
+        }
+    
+    def predict_spending_batch(self, records):
+        """Predict spending for many (user, category) records in one model pass
+        
+        ``records`` is a DataFrame (or list of dicts) with the same fields as
+        ``predict_spending`` accepts. Returns ``(predicted_amounts, confidence)``
+        as arrays aligned with the records, or None if the model is not trained.
+        """
+        return self._predict_batch(records, self._snapshot)
+    
+    def _predict_batch(self, records, snap):
+        """predict_spending_batch against a given snapshot"""
+        if not snap.is_trained:
+            return None
+        
+        features_scaled = snap.scaler.transform(self._prepare_feature_matrix(records, snap))
+        predicted = snap.spending_predictor.predict(features_scaled)
+        confidence = self._calculate_batch_confidence(features_scaled, snap)
+        return np.maximum(predicted, 0), confidence
+    
+    def detect_anomalies(self, user_expenses, snap=None):
+        """Detect unusual spending patterns
+        
+        ``user_expenses`` is a list of expense dicts or a DataFrame with one
+        expense per row; all expenses are scored in one model pass.
+        """
+        snap = snap or self._snapshot
+        if not snap.is_trained or self._is_empty(user_expenses):
             return []
         
-        anomalies = []
+        is_frame = isinstance(user_expenses, pd.DataFrame)
+        expense_list = None if is_frame else list(user_expenses)
+        records = user_expenses if is_frame else pd.DataFrame(expense_list)
+        features_scaled = snap.scaler.transform(self._prepare_feature_matrix(records, snap))
         
-        for expense in user_expenses:
-            features = self._prepare_user_features(expense)
-            features_scaled = self.scaler.transform([features])
-            
-            # Detect anomaly
-            anomaly_score = self.anomaly_detector.decision_function(features_scaled)[0]
-            is_anomaly = self.anomaly_detector.predict(features_scaled)[0] == -1
-            
-            if is_anomaly:
-                anomalies.append({
-                    'expense': expense,
-                    'anomaly_score': anomaly_score,
-                    'reason': self._get_anomaly_reason(expense, anomaly_score)
-                })
+        # IsolationForest flags samples with a negative decision function
+        anomaly_scores = snap.anomaly_detector.decision_function(features_scaled)
+        
+        anomalies = []
+        for i in np.flatnonzero(anomaly_scores < 0):
+            expense = self._expense_record(records.iloc[i]) if is_frame else expense_list[i]
+            anomalies.append({
+                'expense': expense,
+                'anomaly_score': anomaly_scores[i],
+                'reason': self._get_anomaly_reason(expense, anomaly_scores[i])
+            })
         
         return anomalies
     
-    def generate_budget_recommendations(self, user_data, historical_expenses):
+    @staticmethod
+    def _expense_record(row):
+        """One row of an expense DataFrame as the dict a JSON client would have sent"""
+        record = {}
+        for key, value in row.items():
+            if isinstance(value, pd.Timestamp):
+                value = value.date().isoformat() if value == value.normalize() else value.isoformat()
+            elif isinstance(value, np.generic):
+                value = value.item()
+            record[key] = value
+        return record
+    
+    def generate_budget_recommendations(self, user_data, historical_expenses, snap=None):
         """Generate intelligent budget recommendations"""
-        if not self.is_trained:
+        snap = snap or self._snapshot
+        if not snap.is_trained:
             return {'error': 'Model not trained'}
         
         recommendations = []
         
+        # Historical averages for every category in one pass
+        if self._is_empty(historical_expenses):
+            historical_avgs = {}
+        else:
+            history = self.normalize_expenses(historical_expenses)
+            historical_avgs = history.groupby('category')['amount'].mean()
+        
+        # Predict next month spending for every category with one model
+        predictions = self.predict_categories(user_data, snap)
+        
         # Analyze each category
-        for category in self.categories:
-            category_expenses = [e for e in historical_expenses if e.get('category') == category]
-            
-            if not category_expenses:
+        for category in snap.categories:
+            if category not in historical_avgs:
                 continue
             
-            # Calculate historical average
-            historical_avg = np.mean([e['amount'] for e in category_expenses])
-            
-            # Predict next month spending
-            prediction_data = {**user_data, 'category': category}
-            prediction = self.predict_spending(prediction_data)
+            historical_avg = float(historical_avgs[category])
+            prediction = predictions.get(category)
             
             if prediction:
                 predicted_amount = prediction['predicted_amount']
@@ -288,19 +721,339 @@ class AIBudgetManager:
         
         return recommendations
     
+    def forecast_spending(self, user_data, horizon=3, expenses=None):
+        """Project each category's spending over the next ``horizon`` months for one user
+        
+        Pass the user's ``expenses`` history to apply its per-category trend.
+        """
+        forecast = self.forecast_spending_batch([user_data], horizon, expenses=[expenses])
+        if forecast is None:
+            return None
+        
+        months = forecast['months'][0]
+        return {
+            'start_month': int(forecast['start_months'][0]),
+            'months': [
+                {'offset': offset + 1, 'month': int(month), 'month_name': datetime(2025, int(month), 1).strftime('%B')}
+                for offset, month in enumerate(months)
+            ],
+            'by_category': {
+                category: amounts
+                for category, amounts in zip(forecast['categories'], forecast['forecast'][0].round(2).tolist())
+            },
+            'totals': forecast['forecast'][0].sum(axis=0).round(2).tolist(),
+            'confidence': dict(zip(forecast['categories'], forecast['confidence'][0].tolist())),
+            'monthly_trend': dict(zip(forecast['categories'], forecast['monthly_trend'][0].round(4).tolist())),
+            'seasonal_ratio': forecast['seasonal_ratio'][0].round(4).tolist()
+        }
+    
+    def forecast_spending_batch(self, users, horizon=3, expenses=None):
+        """Multi-horizon spending forecasts for many users as one array computation
+        
+        The current-month prediction of every (user, category) pair is shaped
+        by the ratio of ``seasonal_multipliers`` between each target month and
+        the starting month and carried forward with that pair's trend.
+        ``expenses`` is an optional list of expense histories aligned with
+        ``users``; the trend is the least-squares slope of each category's
+        deseasonalized monthly totals, relative to their mean (no history
+        means no trend, so a 12-month horizon returns to the starting level).
+        ``trend_analyzer`` is not used: it is fitted on the calendar month and
+        only captures seasonality. Returns arrays of shape (n_users,
+        n_categories, horizon), or None if the model is not trained.
+        """
+        snap = self._snapshot
+        if not snap.is_trained:
+            return None
+        
+        n_users, n_categories = len(users), len(snap.categories)
+        user_frame = pd.DataFrame(list(users)).drop(columns='expenses', errors='ignore')
+        if 'month' not in user_frame.columns:
+            user_frame['month'] = datetime.now().month
+        user_frame['month'] = user_frame['month'].fillna(datetime.now().month)
+        
+        # Current level of every (user, category) pair in one prediction pass
+        records = user_frame.loc[np.repeat(np.arange(n_users), n_categories)].reset_index(drop=True)
+        records['category'] = np.tile(snap.categories, n_users)
+        level, confidence = self._predict_batch(records, snap)
+        level = level.reshape(n_users, n_categories)
+        confidence = confidence.reshape(n_users, n_categories)
+        
+        # Seasonal shape of each target month relative to the starting month
+        start_months = user_frame['month'].to_numpy(dtype=int)
+        offsets = np.arange(1, horizon + 1)
+        seasonal_table = np.array([self.seasonal_multipliers[month] for month in range(1, 13)])
+        months = (start_months[:, None] - 1 + offsets) % 12 + 1
+        seasonal_ratio = seasonal_table[months - 1] / seasonal_table[start_months - 1][:, None]
+        
+        # Linear trend per (user, category) over every month of the horizon
+        monthly_trend = self._category_trends(expenses, n_users, snap.categories)
+        trend_growth = np.maximum(1 + monthly_trend[:, :, None] * offsets, 0)
+        
+        forecast = level[:, :, None] * seasonal_ratio[:, None, :] * trend_growth
+        
+        return {
+            'categories': list(snap.categories),
+            'start_months': start_months,
+            'months': months,
+            'forecast': forecast,
+            'confidence': confidence,
+            'monthly_trend': monthly_trend,
+            'seasonal_ratio': seasonal_ratio
+        }
+    
+    def _category_trends(self, expenses, n_users, categories):
+        """Relative monthly trend of each (user, category) from deseasonalized expense histories"""
+        trends = np.zeros((n_users, len(categories)))
+        frames = [
+            self.normalize_expenses(history).assign(user=i)
+            for i, history in enumerate(expenses or []) if not self._is_empty(history)
+        ]
+        if not frames:
+            return trends
+        
+        df = pd.concat(frames, ignore_index=True)
+        deseasonalized = df['amount'] / df['month'].map(self.seasonal_multipliers)
+        monthly = deseasonalized.groupby([df['user'], df['category'].astype(str), df['period']]).sum()
+        stats = self._monthly_trend_stats(monthly, ['user', 'category'])
+        stats = stats[(stats['months'] > 1) & (stats['average_monthly'] > 0)]
+        
+        users = stats.index.get_level_values('user').to_numpy()
+        category_index = pd.Index(categories).get_indexer(stats.index.get_level_values('category'))
+        known = category_index >= 0
+        trends[users[known], category_index[known]] = (stats['slope'] / stats['average_monthly']).to_numpy()[known]
+        return trends
+    
+    def optimize_budget(self, user_data, total_budget, min_allocations=None, max_allocations=None,
+                        fixed_costs=None, priorities=None):
+        """Optimize one user's budget allocation; see optimize_budgets_batch"""
+        result = self.optimize_budgets_batch(
+            [user_data], [total_budget],
+            min_allocations=[min_allocations or {}],
+            max_allocations=[max_allocations or {}],
+            fixed_costs=[fixed_costs or {}],
+            priorities=[priorities or {}]
+        )
+        if result is None:
+            return None
+        
+        categories = result['categories']
+        return {
+            'allocations': dict(zip(categories, result['allocations'][0].round(2).tolist())),
+            'predictions': dict(zip(categories, result['predictions'][0].tolist())),
+            'confidence': dict(zip(categories, result['confidence'][0].tolist())),
+            'fixed_costs': result['fixed_costs'][0],
+            'status': result['status'][0],
+            'unallocated': float(result['unallocated'][0]),
+            'shortfall': float(result['shortfall'][0])
+        }
+    
+    def optimize_budgets_batch(self, users, total_budgets, min_allocations=None, max_allocations=None,
+                               fixed_costs=None, priorities=None):
+        """Constrained budget allocation for many users at once
+        
+        For each user the allocation ``x`` over ``self.categories`` minimizes
+        ``sum((x - predicted)**2 / flexibility)`` subject to ``sum(x) == budget``
+        and per-category bounds. Flexibility grows with the predicted amount and
+        with prediction uncertainty and shrinks with priority, so with equal
+        confidence and priorities and no bounds the budget is split in
+        proportion to predicted spending.
+        The solution is ``clip(predicted + lambda * flexibility, lower, upper)``
+        (water-filling); ``lambda`` is found for all users together by bisection.
+        
+        Constraint arguments are lists with one dict per user mapping category
+        to amount (priorities map to 'low'/'medium'/'high' or a positive
+        weight). Fixed costs on categories outside ``self.categories`` (e.g.
+        rent) are taken off the top of the budget. Returns arrays of shape
+        (n_users, n_categories) plus per-user status, or None if the model is
+        not trained.
+        """
+        snap = self._snapshot
+        if not snap.is_trained:
+            return None
+        
+        n_users, n_categories = len(users), len(snap.categories)
+        category_index = {category: i for i, category in enumerate(snap.categories)}
+        
+        # One prediction pass over every (user, category) pair
+        records = pd.DataFrame(list(users)).loc[np.repeat(np.arange(n_users), n_categories)]
+        records['category'] = np.tile(snap.categories, n_users)
+        predicted, confidence = self._predict_batch(records.reset_index(drop=True), snap)
+        predicted = predicted.reshape(n_users, n_categories)
+        confidence = confidence.reshape(n_users, n_categories)
+        
+        def constraint_matrix(per_user, default, named_values=None):
+            matrix = np.full((n_users, n_categories), default, dtype=float)
+            for row, values in enumerate(per_user or []):
+                for category, value in (values or {}).items():
+                    if category in category_index:
+                        if named_values is not None:
+                            value = named_values.get(value, value)
+                        matrix[row, category_index[category]] = value
+            return matrix
+        
+        lower = np.maximum(constraint_matrix(min_allocations, 0.0), 0.0)
+        upper = constraint_matrix(max_allocations, np.inf)
+        fixed = constraint_matrix(fixed_costs, np.nan)
+        priority = np.maximum(constraint_matrix(priorities, 1.0, self.PRIORITY_WEIGHTS), 1e-6)
+        
+        # Fixed costs pin their category, or come off the top for other expenses
+        is_fixed = ~np.isnan(fixed)
+        lower = np.where(is_fixed, fixed, lower)
+        upper = np.where(is_fixed, fixed, np.maximum(upper, lower))
+        external_fixed = [
+            {k: v for k, v in (costs or {}).items() if k not in category_index}
+            for costs in (fixed_costs or [{}] * n_users)
+        ]
+        budgets = np.asarray(total_budgets, dtype=float) - np.array(
+            [sum(costs.values()) for costs in external_fixed], dtype=float)
+        
+        # Less confident predictions and lower priorities absorb more of the adjustment
+        demand_floor = np.maximum(predicted.mean(axis=1, keepdims=True) * 0.01, 1.0)
+        flexibility = (np.maximum(predicted, demand_floor)
+                       * (2.0 - np.clip(confidence, 0, 100) / 100.0) / priority)
+        
+        allocations, status = self._water_fill(predicted, flexibility, lower, upper, budgets)
+        
+        return {
+            'categories': list(snap.categories),
+            'allocations': allocations,
+            'predictions': predicted,
+            'confidence': confidence,
+            'fixed_costs': external_fixed,
+            'status': status,
+            'unallocated': np.maximum(budgets - allocations.sum(axis=1), 0).round(2),
+            'shortfall': np.maximum(allocations.sum(axis=1) - budgets, 0).round(2)
+        }
+    
+    @staticmethod
+    def _water_fill(target, flexibility, lower, upper, budgets, iterations=64):
+        """Solve clip(target + lam * flexibility, lower, upper).sum(axis=1) == budgets for lam
+        
+        Users whose bounds cannot meet the budget get the nearest bound and a
+        status of 'infeasible' (minimums exceed the budget) or 'capped'
+        (maximums leave part of the budget unallocated).
+        """
+        budgets = budgets[:, None]
+        # No category can usefully receive more than the whole budget
+        upper = np.minimum(upper, np.maximum(budgets, lower))
+        
+        lam_low = ((lower - target) / flexibility).min(axis=1, keepdims=True)
+        lam_high = ((upper - target) / flexibility).max(axis=1, keepdims=True)
+        for _ in range(iterations):
+            lam = (lam_low + lam_high) / 2
+            allocated = np.clip(target + lam * flexibility, lower, upper).sum(axis=1, keepdims=True)
+            too_much = allocated > budgets
+            lam_high = np.where(too_much, lam, lam_high)
+            lam_low = np.where(too_much, lam_low, lam)
+        
+        allocations = np.clip(target + lam_high * flexibility, lower, upper)
+        
+        status = np.full(len(budgets), 'optimal', dtype=object)
+        status[lower.sum(axis=1) > budgets[:, 0] + 1e-9] = 'infeasible'
+        status[upper.sum(axis=1) < budgets[:, 0] - 1e-9] = 'capped'
+        return allocations, status
+    
+    def find_savings_opportunities(self, current_budget, predictions):
+        """Categories whose current budget exceeds predicted spending by more than 20%"""
+        if not current_budget:
+            return []
+        
+        categories = list(current_budget)
+        current = np.array([current_budget[c] for c in categories], dtype=float)
+        predicted = np.array([predictions.get(c, np.nan) for c in categories], dtype=float)
+        predicted = np.where(np.isnan(predicted), current, predicted)
+        
+        recommended = predicted * 1.1  # 10% buffer
+        over_budget = current > predicted * 1.2  # 20% buffer
+        
+        return [
+            {
+                'category': categories[i],
+                'current_budget': float(current[i]),
+                'recommended_budget': float(recommended[i]),
+                'potential_savings': float(current[i] - recommended[i]),
+                'confidence': 'medium'
+            }
+            for i in np.flatnonzero(over_budget)
+        ]
+    
+    def normalize_expenses(self, expenses):
+        """Parse expense dates once into a columnar batch shared by all analytics
+
+        Returns a DataFrame with ``date`` as datetime64 plus derived ``year``,
+        ``month``, ``quarter``, ``day_of_week`` and ``period`` (months since
+        year 0, usable as a sortable month key) columns. Frames that were
+        already normalized are returned unchanged.
+        """
+        if isinstance(expenses, pd.DataFrame):
+            if 'period' in expenses.columns and pd.api.types.is_datetime64_any_dtype(expenses.get('date')):
+                return expenses
+            df = expenses.copy()
+        else:
+            df = pd.DataFrame(list(expenses) if expenses is not None else [])
+        
+        if 'date' in df.columns:
+            dates = self._parse_dates(df['date'])
+            df['date'] = dates
+            df['year'] = dates.dt.year.astype('int16')
+            df['month'] = dates.dt.month.astype('int8')
+            df['quarter'] = dates.dt.quarter.astype('int8')
+            df['day_of_week'] = dates.dt.dayofweek.astype('int8')
+            df['period'] = df['year'].astype('int32') * 12 + df['month'] - 1
+        
+        if 'amount' in df.columns:
+            df['amount'] = pd.to_numeric(df['amount'])
+        
+        return df
+    
+    @staticmethod
+    def _parse_dates(dates):
+        """Vectorized ISO date parsing with a fast path for fixed YYYY-MM-DD strings"""
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            parsed = pd.Series(dates)
+        else:
+            try:
+                # Fast path: plain dates as sent by the frontend
+                parsed = pd.to_datetime(dates, format='%Y-%m-%d')
+            except (ValueError, TypeError):
+                # Drop UTC offsets to keep wall-clock fields, matching datetime.fromisoformat
+                local = pd.Series(dates).astype(str).str.replace(r'(Z|[+-]\d\d:?\d\d)$', '', regex=True)
+                parsed = pd.to_datetime(local, format='ISO8601')
+        
+        if getattr(parsed.dt, 'tz', None) is not None:
+            parsed = parsed.dt.tz_localize(None)
+        return parsed
+    
+    @staticmethod
+    def _is_empty(expenses):
+        """Check for missing expenses in either list or DataFrame form"""
+        return expenses is None or len(expenses) == 0
+    
+    @staticmethod
+    def _monthly_trend_stats(monthly, level):
+        """Least-squares slope, mean and length of each group's monthly series"""
+        groups = monthly.groupby(level=level, sort=False)
+        x = groups.cumcount().astype(float)
+        x_centered = x - x.groupby(level=level, sort=False).transform('mean')
+        y_centered = monthly - groups.transform('mean')
+        return pd.DataFrame({
+            'months': groups.size(),
+            'average_monthly': groups.mean(),
+            'slope': (x_centered * y_centered).groupby(level=level, sort=False).sum()
+                     / (x_centered ** 2).groupby(level=level, sort=False).sum()
+        })
+    
     def analyze_spending_trends(self, user_expenses):
         """Analyze spending trends and patterns"""
-        if not user_expenses:
+        if self._is_empty(user_expenses):
             return {'error': 'No expense data provided'}
         
-        df = pd.DataFrame(user_expenses)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
+        df = self.normalize_expenses(user_expenses).sort_values('date', kind='stable')
         
         trends = {}
         
         # Overall trend
-        monthly_totals = df.groupby(df['date'].dt.to_period('M'))['amount'].sum()
+        monthly_totals = df.groupby('period')['amount'].sum()
         if len(monthly_totals) > 1:
             trend_slope = np.polyfit(range(len(monthly_totals)), monthly_totals.values, 1)[0]
             trends['overall'] = {
@@ -309,29 +1062,27 @@ class AIBudgetManager:
                 'monthly_change': trend_slope
             }
         
-        # Category trends
+        # Category trends, fitted for all categories at once
         trends['by_category'] = {}
+        cat_monthly = df.groupby(['category', 'period'])['amount'].sum()
+        cat_stats = self._monthly_trend_stats(cat_monthly, 'category')
         for category in df['category'].unique():
-            cat_data = df[df['category'] == category]
-            cat_monthly = cat_data.groupby(cat_data['date'].dt.to_period('M'))['amount'].sum()
-            
-            if len(cat_monthly) > 1:
-                cat_slope = np.polyfit(range(len(cat_monthly)), cat_monthly.values, 1)[0]
+            stats = cat_stats.loc[category]
+            if stats['months'] > 1:
                 trends['by_category'][category] = {
-                    'direction': 'increasing' if cat_slope > 0 else 'decreasing',
-                    'slope': cat_slope,
-                    'average_monthly': cat_monthly.mean()
+                    'direction': 'increasing' if stats['slope'] > 0 else 'decreasing',
+                    'slope': float(stats['slope']),
+                    'average_monthly': float(stats['average_monthly'])
                 }
         
         # Seasonal patterns
         trends['seasonal'] = {}
-        for month in range(1, 13):
-            month_data = df[df['date'].dt.month == month]
-            if not month_data.empty:
-                trends['seasonal'][month] = {
-                    'average_spending': month_data['amount'].mean(),
-                    'transaction_count': len(month_data)
-                }
+        seasonal = df.groupby('month')['amount'].agg(['mean', 'size'])
+        for month, row in seasonal.iterrows():
+            trends['seasonal'][int(month)] = {
+                'average_spending': float(row['mean']),
+                'transaction_count': int(row['size'])
+            }
         
         return trends
     
@@ -346,32 +1097,36 @@ class AIBudgetManager:
             'optimization_tips': []
         }
         
+        # One snapshot serves every model-based part of the insights
+        snap = self._snapshot
+        
         # Get predictions
-        for category in self.categories:
-            prediction = self.predict_spending({**user_data, 'category': category})
-            if prediction:
-                insights['predictions'][category] = prediction
+        insights['predictions'] = self.predict_categories(user_data, snap)
         
         # Detect anomalies
-        insights['anomalies'] = self.detect_anomalies(expenses)
+        insights['anomalies'] = self.detect_anomalies(expenses, snap)
+        
+        # Parse dates once and share the columnar batch with every analytic
+        expense_frame = None if self._is_empty(expenses) else self.normalize_expenses(expenses)
         
         # Generate recommendations
-        insights['recommendations'] = self.generate_budget_recommendations(user_data, expenses)
+        insights['recommendations'] = self.generate_budget_recommendations(user_data, expense_frame, snap)
         
         # Analyze trends
-        insights['trends'] = self.analyze_spending_trends(expenses)
+        insights['trends'] = self.analyze_spending_trends(expense_frame)
         
         # Generate alerts
-        insights['alerts'] = self._generate_alerts(expenses, budget_goals)
+        insights['alerts'] = self._generate_alerts(expense_frame, budget_goals)
         
         # Optimization tips
-        insights['optimization_tips'] = self._generate_optimization_tips(expenses, insights['trends'])
+        insights['optimization_tips'] = self._generate_optimization_tips(expense_frame, insights['trends'])
         
         return insights
     
-    def _prepare_user_features(self, user_data):
+    def _prepare_user_features(self, user_data, snap=None):
         """Prepare features for a single user prediction"""
-        if not self.feature_names:
+        snap = snap or self._snapshot
+        if not snap.feature_names:
             # Fallback if feature names not stored
             print("⚠️ Feature names not available, using default order")
             return [0] * 21  # Default to expected number of features
@@ -380,10 +1135,11 @@ class AIBudgetManager:
         features = {}
         
         # Time-based features
-        features['month'] = user_data.get('month', datetime.now().month)
-        features['quarter'] = user_data.get('quarter', (datetime.now().month - 1) // 3 + 1)
-        features['day_of_week'] = user_data.get('day_of_week', datetime.now().weekday())
-        features['is_weekend'] = 1 if datetime.now().weekday() >= 5 else 0
+        now = datetime.now()
+        features['month'] = user_data.get('month', now.month)
+        features['quarter'] = user_data.get('quarter', (features['month'] - 1) // 3 + 1)
+        features['day_of_week'] = user_data.get('day_of_week', now.weekday())
+        features['is_weekend'] = 1 if features['day_of_week'] >= 5 else 0
         
         # User features
         features['user_income'] = user_data.get('user_income', 5000)
@@ -397,21 +1153,80 @@ class AIBudgetManager:
         
         # Category features (one-hot encoded)
         category = user_data.get('category', 'other')
-        for cat in self.categories:
+        for cat in snap.categories:
             features[f'cat_{cat}'] = 1 if cat == category else 0
         
-        # Historical features (default to 0 for new predictions)
-        features['prev_month_spending'] = user_data.get('prev_month_spending', 0)
-        features['avg_3month_spending'] = user_data.get('avg_3month_spending', 0)
+        # Historical features: from the caller, else the user's feature snapshot, else 0
+        stored = self._stored_lag_features(user_data.get('user_id'), category) or {}
+        features['prev_month_spending'] = user_data.get('prev_month_spending', stored.get('prev_month_spending', 0))
+        features['avg_3month_spending'] = user_data.get('avg_3month_spending', stored.get('avg_3month_spending', 0))
         
         # Return features in the same order as stored feature names
-        return [features.get(feat, 0) for feat in self.feature_names]
+        return [features.get(feat, 0) for feat in snap.feature_names]
+    
+    def _prepare_feature_matrix(self, records, snap=None):
+        """Vectorized _prepare_user_features over many prediction records"""
+        snap = snap or self._snapshot
+        records = pd.DataFrame(records).reset_index(drop=True)
+        n_rows = len(records)
+        now = datetime.now()
+        
+        def column(name, default):
+            if name not in records.columns:
+                return np.full(n_rows, default, dtype=float)
+            return records[name].fillna(default).to_numpy(dtype=float)
+        
+        month = column('month', now.month)
+        day_of_week = column('day_of_week', now.weekday())
+        risk_tolerance = (records['user_risk_tolerance'].fillna('medium') if 'user_risk_tolerance' in records.columns
+                          else pd.Series('medium', index=records.index))
+        category = (records['category'].fillna('other') if 'category' in records.columns
+                    else pd.Series('other', index=records.index))
+        
+        features = {
+            'month': month,
+            'quarter': column('quarter', np.nan),
+            'day_of_week': day_of_week,
+            'is_weekend': (day_of_week >= 5).astype(float),
+            'user_income': column('user_income', 5000),
+            'user_age': column('user_age', 30),
+            'prev_month_spending': column('prev_month_spending', np.nan),
+            'avg_3month_spending': column('avg_3month_spending', np.nan)
+        }
+        if self.feature_store is not None and 'user_id' in records.columns:
+            stored = [
+                self._stored_lag_features(user_id, cat) if pd.notna(user_id) else None
+                for user_id, cat in zip(records['user_id'], category)
+            ]
+            for name in ['prev_month_spending', 'avg_3month_spending']:
+                from_store = np.array([lags[name] if lags else np.nan for lags in stored], dtype=float)
+                features[name] = np.where(np.isnan(features[name]), from_store, features[name])
+        for name in ['prev_month_spending', 'avg_3month_spending']:
+            features[name] = np.nan_to_num(features[name], nan=0.0)
+        features['quarter'] = np.where(np.isnan(features['quarter']), (month - 1) // 3 + 1, features['quarter'])
+        for level in ['high', 'low', 'medium']:
+            features[f'risk_{level}'] = (risk_tolerance == level).to_numpy(dtype=float)
+        for cat in snap.categories:
+            features[f'cat_{cat}'] = (category == cat).to_numpy(dtype=float)
+        
+        matrix = np.zeros((n_rows, len(snap.feature_names)))
+        for i, name in enumerate(snap.feature_names):
+            if name in features:
+                matrix[:, i] = features[name]
+        return matrix
+    
+    def _stored_lag_features(self, user_id, category):
+        """Lag features for a user's category from the feature snapshot store, if any"""
+        if self.feature_store is None or user_id is None:
+            return None
+        return self.feature_store.lag_features(user_id).get(category)
     
-    def _calculate_prediction_confidence(self, features_scaled):
+    def _calculate_prediction_confidence(self, features_scaled, snap=None):
         """Calculate confidence score for predictions"""
+        snap = snap or self._snapshot
         # Use ensemble variance as confidence measure
         predictions = []
-        for estimator in self.spending_predictor.estimators_:
+        for estimator in snap.spending_predictor.estimators_:
             pred = estimator.predict(features_scaled)[0]
             predictions.append(pred)
         
@@ -419,6 +1234,14 @@ class AIBudgetManager:
         confidence = max(0, min(100, 100 - variance / 10))  # Simple confidence calculation
         return confidence
     
+    def _calculate_batch_confidence(self, features_scaled, snap=None):
+        """Per-row version of _calculate_prediction_confidence"""
+        snap = snap or self._snapshot
+        tree_predictions = np.stack([estimator.predict(features_scaled)
+                                     for estimator in snap.spending_predictor.estimators_])
+        variance = tree_predictions.var(axis=0)
+        return np.clip(100 - variance / 10, 0, 100)
+    
     def _get_anomaly_reason(self, expense, anomaly_score):
         """Determine reason for anomaly detection"""
         if anomaly_score < -0.5:
@@ -439,84 +1262,148 @@ class AIBudgetManager:
         else:
             return 'low'
     
+    def generate_alerts_batch(self, expenses, budget_goals, as_of=None, rules=None):
+        """Evaluate budget alert rules for many users in one pass
+        
+        ``expenses`` is columnar expense data (DataFrame or records) with
+        user_id, date, category and amount. ``budget_goals`` is either
+        ``{user_id: {category: budget}}`` or records with user_id, category
+        and budget. Month-to-date spend per (user, category) counts expenses
+        in the month of ``as_of`` (default now) up to the end of that day.
+        ``rules`` defaults to ALERT_RULES; pass e.g.
+        ``ALERT_RULES + [PACE_ALERT_RULE]`` to add rules. Returns a DataFrame
+        with one row per alert, in budget goal order. Raises ValueError for
+        expenses missing a required column or rules with an unknown metric.
+        """
+        as_of = as_of or datetime.now()
+        if as_of.tzinfo is not None:
+            # Expense dates are naive wall-clock times (see _parse_dates)
+            as_of = as_of.replace(tzinfo=None)
+        rules = self.ALERT_RULES if rules is None else rules
+        goals = self._budget_goal_frame(budget_goals)
+        columns = ['user_id', 'category', 'type', 'severity', 'spent', 'budget',
+                   'percentage', 'projected_percentage', 'message']
+        if goals.empty or not rules:
+            return pd.DataFrame(columns=columns)
+        
+        # Month-to-date spend for every (user, category) with one groupby
+        goal_keys = pd.MultiIndex.from_arrays([goals['user_id'].astype(str), goals['category'].astype(str)])
+        if self._is_empty(expenses):
+            spent = np.zeros(len(goals))
+        else:
+            df = self.normalize_expenses(expenses)
+            missing = [column for column in ('user_id', 'date', 'category', 'amount') if column not in df.columns]
+            if missing:
+                raise ValueError(f"Expenses are missing columns: {missing}")
+            day_end = pd.Timestamp(as_of).normalize() + pd.Timedelta(days=1)
+            month_to_date = ((df['period'].to_numpy() == as_of.year * 12 + as_of.month - 1)
+                             & (df['date'] < day_end).to_numpy())
+            mtd = df.loc[month_to_date]
+            totals = mtd['amount'].groupby([mtd['user_id'].astype(str), mtd['category'].astype(str)]).sum()
+            spent = totals.reindex(goal_keys, fill_value=0).to_numpy(dtype=float)
+        
+        budget = goals['budget'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage = np.where(budget > 0, spent / budget * 100, 0.0)
+        days_in_month = calendar.monthrange(as_of.year, as_of.month)[1]
+        metrics = {
+            'spent': spent,
+            'budget': budget,
+            'remaining': budget - spent,
+            'percentage': percentage,
+            'projected_percentage': percentage * days_in_month / as_of.day
+        }
+        
+        for rule in rules:
+            if rule['metric'] not in metrics:
+                raise ValueError(f"Unknown alert metric: {rule['metric']}")
+        rule_index = np.select(
+            [metrics[rule['metric']] > rule['threshold'] for rule in rules],
+            np.arange(len(rules)),
+            default=-1
+        )
+        hits = np.flatnonzero(rule_index >= 0)
+        matched = [rules[i] for i in rule_index[hits]]
+        
+        alerts = pd.DataFrame({
+            'user_id': goals['user_id'].to_numpy()[hits],
+            'category': goals['category'].to_numpy()[hits],
+            'type': [rule['type'] for rule in matched],
+            'severity': [rule['severity'] for rule in matched],
+            'spent': spent[hits],
+            'budget': budget[hits],
+            'percentage': percentage[hits],
+            'projected_percentage': metrics['projected_percentage'][hits]
+        }, columns=columns[:-1])
+        alerts['message'] = [
+            rule.get('message', self.ALERT_MESSAGE).format(**row)
+            for rule, row in zip(matched, alerts.to_dict('records'))
+        ]
+        return alerts
+    
+    @staticmethod
+    def _budget_goal_frame(budget_goals):
+        """Budget goals as user_id/category/budget rows, from nested dicts or records"""
+        if isinstance(budget_goals, dict):
+            return pd.DataFrame(
+                [(user_id, category, budget)
+                 for user_id, goals in budget_goals.items()
+                 for category, budget in goals.items()],
+                columns=['user_id', 'category', 'budget']
+            )
+        return pd.DataFrame(budget_goals if budget_goals is not None else [],
+                            columns=['user_id', 'category', 'budget'])
+    
     def _generate_alerts(self, expenses, budget_goals):
         """Generate spending alerts"""
-        alerts = []
-        
-        if not expenses or not budget_goals:
-            return alerts
-        
-        # Calculate current month spending
-        current_month = datetime.now().month
-        current_expenses = [e for e in expenses if datetime.fromisoformat(e['date']).month == current_month]
-        
-        category_spending = {}
-        for expense in current_expenses:
-            cat = expense['category']
-            category_spending[cat] = category_spending.get(cat, 0) + expense['amount']
-        
-        # Check against budget goals
-        for category, budget in budget_goals.items():
-            spent = category_spending.get(category, 0)
-            percentage = (spent / budget) * 100 if budget > 0 else 0
-            
-            if percentage > 90:
-                alerts.append({
-                    'type': 'budget_exceeded',
-                    'category': category,
-                    'message': f"You've spent {percentage:.1f}% of your {category} budget",
-                    'severity': 'high'
-                })
-            elif percentage > 75:
-                alerts.append({
-                    'type': 'budget_warning',
-                    'category': category,
-                    'message': f"You've spent {percentage:.1f}% of your {category} budget",
-                    'severity': 'medium'
-                })
+        if self._is_empty(expenses) or not budget_goals:
+            return []
         
-        return alerts
+        # A single user's expenses through the batch alert engine
+        df = self.normalize_expenses(expenses).assign(user_id=0)
+        alerts = self.generate_alerts_batch(df, {0: budget_goals})
+        return alerts[['type', 'category', 'message', 'severity']].to_dict('records')
     
     def _generate_optimization_tips(self, expenses, trends):
         """Generate optimization tips based on spending analysis"""
         tips = []
         
-        if not expenses or not trends.get('by_category'):
+        if self._is_empty(expenses) or not trends.get('by_category'):
             return tips
         
         # Find highest spending categories
-        category_totals = {}
-        for expense in expenses:
-            cat = expense['category']
-            category_totals[cat] = category_totals.get(cat, 0) + expense['amount']
-        
-        sorted_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
+        df = self.normalize_expenses(expenses)
+        category_totals = df.groupby('category', sort=False)['amount'].sum()
+        top_categories = category_totals.sort_values(ascending=False, kind='stable').head(3)
         
         # Generate tips for top spending categories
-        for category, total in sorted_categories[:3]:
+        for category, total in top_categories.items():
             if category in trends['by_category']:
                 trend = trends['by_category'][category]
                 if trend['direction'] == 'increasing':
                     tips.append({
                         'category': category,
                         'tip': f"Your {category} spending is trending upward. Consider setting a monthly limit.",
-                        'potential_savings': total * 0.1  # Assume 10% savings potential
+                        'potential_savings': float(total) * 0.1  # Assume 10% savings potential
                     })
         
         return tips
     
     def save_model(self, filepath='ai_budget_model.pkl'):
         """Save trained model to disk"""
-        if self.is_trained:
+        snap = self._snapshot
+        if snap.is_trained:
             model_data = {
-                'spending_predictor': self.spending_predictor,
-                'anomaly_detector': self.anomaly_detector,
-                'trend_analyzer': self.trend_analyzer,
-                'scaler': self.scaler,
-                'category_encoder': self.category_encoder,
-                'feature_names': self.feature_names,
-                'categories': self.categories,
-                'is_trained': self.is_trained
+                'spending_predictor': snap.spending_predictor,
+                'anomaly_detector': snap.anomaly_detector,
+                'trend_analyzer': snap.trend_analyzer,
+                'scaler': snap.scaler,
+                'category_encoder': snap.category_encoder,
+                'feature_names': list(snap.feature_names),
+                'categories': list(snap.categories),
+                'model_params': self.model_params,
+                'model_version': snap.model_version,
+                'is_trained': snap.is_trained
             }
             joblib.dump(model_data, filepath)
             print(f"✅ Model saved to {filepath}")
@@ -527,14 +1414,20 @@ class AIBudgetManager:
         """Load trained model from disk"""
         try:
             model_data = joblib.load(filepath)
-            self.spending_predictor = model_data['spending_predictor']
-            self.anomaly_detector = model_data['anomaly_detector']
-            self.trend_analyzer = model_data['trend_analyzer']
-            self.scaler = model_data['scaler']
-            self.category_encoder = model_data['category_encoder']
-            self.feature_names = model_data.get('feature_names', [])
-            self.categories = model_data.get('categories', self.categories)
-            self.is_trained = model_data['is_trained']
+            self.model_params = model_data.get('model_params', self.model_params)
+            # Publish the loaded models with one atomic reference swap
+            self._snapshot = ModelSnapshot(
+                spending_predictor=model_data['spending_predictor'],
+                anomaly_detector=model_data['anomaly_detector'],
+                trend_analyzer=model_data['trend_analyzer'],
+                scaler=model_data['scaler'],
+                category_encoder=model_data['category_encoder'],
+                feature_names=tuple(model_data.get('feature_names', [])),
+                categories=tuple(model_data.get('categories', self._snapshot.categories)),
+                # Artifacts saved before versioning get a version derived from their content
+                model_version=model_data.get('model_version') or f"artifact-{joblib.hash(model_data['spending_predictor'])[:8]}",
+                is_trained=model_data['is_trained']
+            )
             print(f"✅ Model loaded from {filepath}")
         except FileNotFoundError:
             print(f"❌ Model file {filepath} not found")
@@ -610,6 +1503,46 @@ def demo_ai_budget_manager():
         for tip in insights['optimization_tips']:
             print(f"     • {tip['tip']} (Potential savings: ${tip['potential_savings']:.2f})")
     
+    print("\n📅 12-Month Forecast:")
+    forecast = ai_budget.forecast_spending_batch([user_data], horizon=12)
+    print(f"   • Next month total: ${forecast['forecast'][0, :, 0].sum():.2f}")
+    # Without drift a full year ahead lands back on the same calendar month's level
+    level, _ = ai_budget._predict_batch(
+        pd.DataFrame([{**user_data, 'category': category} for category in forecast['categories']]),
+        ai_budget._snapshot
+    )
+    if np.allclose(forecast['forecast'][0, :, 11], level):
+        print("   • Same month next year matches this month's level")
+    else:
+        print("   ⚠️ Same month next year drifted from this month's level")
+    
+    print("\n🧮 Lag Feature Parity:")
+    # A history with skipped months, streamed in small chunks and stored per user
+    from ai_budget_feature_store import FeatureSnapshotStore
+    this_month = pd.Timestamp(datetime.now()).to_period('M')
+    history = pd.DataFrame([
+        {'user_id': 1, 'date': (this_month - months_ago).to_timestamp(), 'category': category, 'amount': amount,
+         'user_income': 6000.0, 'user_age': 28, 'user_risk_tolerance': 'medium'}
+        for category, spending in [('food', {5: 100, 4: 200, 2: 300, 1: 400}), ('travel', {4: 500, 3: 250, 2: 80})]
+        for months_ago, amount in spending.items()
+    ] + [
+        {'user_id': 1, 'date': this_month.to_timestamp(), 'category': category, 'amount': 0.0,
+         'user_income': 6000.0, 'user_age': 28, 'user_risk_tolerance': 'medium'}
+        for category in ['food', 'travel']
+    ]).sort_values('date', kind='stable')
+    chunks = [history.iloc[i:i + 2] for i in range(0, len(history), 2)]
+    streamed = pd.concat(list(ai_budget._iter_lagged_chunks(chunks)))
+    store = FeatureSnapshotStore()
+    store.record_expenses(1, ai_budget.normalize_expenses(history.iloc[:-2]))
+    served = store.lag_features(1)
+    current = streamed.loc[streamed['period'] == streamed['period'].max()]
+    matches = all(
+        np.allclose([row.prev_month_spending, row.avg_3month_spending],
+                    [served[row.category]['prev_month_spending'], served[row.category]['avg_3month_spending']])
+        for row in current.itertuples()
+    )
+    print(f"   • {'Training and serving lag features match' if matches else '⚠️ Training and serving lag features differ'}")
+
     # Save the model
     ai_budget.save_model('ai_budget_model.pkl')
     
@@ -0,0 +1,220 @@
+# Model Registry for the AI Budget API server
+# Holds several AIBudgetManager instances keyed by name and version so that
+# different user segments (regions, income bands) and A/B test arms can be
+# served side by side. Artifacts are loaded lazily on first use and the least
+# recently used models are unloaded when the memory budget is exceeded.
+
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from ai_budget_ml_model import AIBudgetManager
+
+
+class ModelNotFoundError(KeyError):
+    """Raised when a request routes to a model that is not registered"""
+
+
+class ModelRegistry:
+    def __init__(self, max_loaded_bytes=2 * 1024 ** 3, max_loaded_models=8, latency_window=1000, feature_store=None):
+        """Initialize an empty registry with a memory budget for loaded models
+        
+        ``feature_store`` is attached to every model loaded from an artifact.
+        """
+        self.max_loaded_bytes = max_loaded_bytes
+        self.max_loaded_models = max_loaded_models
+        self.latency_window = latency_window
+        self.feature_store = feature_store
+        self.default_name = None
+        
+        self._lock = threading.Lock()
+        self._models = {}  # (name, version) -> registration entry
+        self._loaded = OrderedDict()  # (name, version) -> manager, in LRU order
+        self._load_locks = {}
+        self._traffic_splits = {}  # name -> [(version, cumulative weight)]
+    
+    def register(self, name, version, artifact_path=None, manager=None, pinned=False, default=False):
+        """Register a model from an artifact path or an already loaded manager
+        
+        Pinned models are never unloaded. The first registered name becomes the
+        default unless another one is registered with ``default=True``.
+        Versions are immutable: registering an existing (name, version) again
+        raises ValueError; unregister it first or register a new version.
+        """
+        if artifact_path is None and manager is None:
+            raise ValueError("A model needs either an artifact_path or a manager")
+        
+        key = (name, str(version))
+        size = os.path.getsize(artifact_path) if artifact_path and os.path.exists(artifact_path) else 0
+        
+        with self._lock:
+            if key in self._models:
+                raise ValueError(f"Model {name}:{key[1]} is already registered")
+            self._models[key] = {
+                'artifact_path': artifact_path,
+                'pinned': pinned or artifact_path is None,
+                'size_bytes': size,
+                'registered_at': time.time(),
+                'loads': 0,
+                'hits': 0,
+                'latencies': deque(maxlen=self.latency_window),
+                'total_seconds': 0.0
+            }
+            self._load_locks.setdefault(key, threading.Lock())
+            if manager is not None:
+                self._loaded[key] = manager
+            if default or self.default_name is None:
+                self.default_name = name
+        return key
+    
+    def unregister(self, name, version):
+        """Remove a model and unload it"""
+        key = (name, str(version))
+        with self._lock:
+            if key not in self._models:
+                raise ModelNotFoundError(f"Model {name}:{version} is not registered")
+            del self._models[key]
+            self._loaded.pop(key, None)
+            if name in self._traffic_splits:
+                self._traffic_splits[name] = [(v, w) for v, w in self._traffic_splits[name] if v != key[1]]
+    
+    def set_traffic_split(self, name, weights):
+        """Split traffic for ``name`` between versions, e.g. {'1': 0.9, '2': 0.1}"""
+        total = float(sum(weights.values()))
+        if total <= 0:
+            raise ValueError("Traffic split weights must sum to a positive value")
+        
+        with self._lock:
+            for version in weights:
+                if (name, str(version)) not in self._models:
+                    raise ModelNotFoundError(f"Model {name}:{version} is not registered")
+            
+            cumulative, split = 0.0, []
+            for version, weight in weights.items():
+                cumulative += weight / total
+                split.append((str(version), cumulative))
+            self._traffic_splits[name] = split
+    
+    def resolve(self, name=None, version=None, routing_key=None):
+        """Pick the (name, version) that should serve a request
+        
+        Without an explicit version, a traffic split assigns versions by a
+        stable hash of ``routing_key`` (e.g. the user id) so that a user stays
+        in the same A/B arm; otherwise the most recently registered version
+        is used.
+        """
+        name = name or self.default_name
+        with self._lock:
+            if version is not None:
+                key = (name, str(version))
+                if key not in self._models:
+                    raise ModelNotFoundError(f"Model {name}:{version} is not registered")
+                return key
+            
+            split = self._traffic_splits.get(name)
+            if split:
+                bucket = (zlib.crc32(str(routing_key).encode()) % 10000) / 10000
+                for split_version, cumulative in split:
+                    if bucket < cumulative:
+                        return (name, split_version)
+                return (name, split[-1][0])
+            
+            versions = [key for key in self._models if key[0] == name]
+            if not versions:
+                raise ModelNotFoundError(f"Model {name} is not registered")
+            return max(versions, key=lambda key: self._models[key]['registered_at'])
+    
+    def get(self, name=None, version=None, routing_key=None):
+        """Return ``(manager, key)`` for a request, loading the artifact if needed"""
+        key = self.resolve(name, version, routing_key)
+        
+        with self._lock:
+            entry = self._models[key]
+            entry['hits'] += 1
+            manager = self._loaded.get(key)
+            if manager is not None:
+                self._loaded.move_to_end(key)
+                return manager, key
+            load_lock = self._load_locks[key]
+        
+        # Load outside the registry lock so other models keep serving
+        with load_lock:
+            with self._lock:
+                manager = self._loaded.get(key)
+            if manager is None:
+                manager = AIBudgetManager()
+                manager.feature_store = self.feature_store
+                try:
+                    manager.load_model(entry['artifact_path'])
+                except Exception as e:
+                    # Corrupt or incompatible artifacts are reported like missing ones
+                    raise ModelNotFoundError(f"Model artifact for {key[0]}:{key[1]} could not be loaded: {e}")
+                if not manager.is_trained:
+                    raise ModelNotFoundError(f"Model artifact for {key[0]}:{key[1]} could not be loaded")
+                with self._lock:
+                    entry['loads'] += 1
+                    self._loaded[key] = manager
+                    self._evict()
+        return manager, key
+    
+    def _evict(self):
+        """Unload least recently used models until the memory budget is met"""
+        def over_budget():
+            unpinned = [key for key in self._loaded if not self._models[key]['pinned']]
+            loaded_bytes = sum(self._models[key]['size_bytes'] for key in unpinned)
+            return unpinned and (loaded_bytes > self.max_loaded_bytes or len(self._loaded) > self.max_loaded_models)
+        
+        while over_budget():
+            # Keep the model that was just loaded
+            for key in list(self._loaded)[:-1]:
+                if not self._models[key]['pinned']:
+                    del self._loaded[key]
+                    break
+            else:
+                break
+    
+    def record_latency(self, key, seconds):
+        """Record the serving time of one request for a model"""
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                entry['latencies'].append(seconds)
+                entry['total_seconds'] += seconds
+    
+    def list_models(self):
+        """Describe every registered model with its serving statistics"""
+        with self._lock:
+            models = []
+            for (name, version), entry in self._models.items():
+                latencies = np.array(entry['latencies'], dtype=float)
+                models.append({
+                    'name': name,
+                    'version': version,
+                    'artifact_path': entry['artifact_path'],
+                    'loaded': (name, version) in self._loaded,
+                    'pinned': entry['pinned'],
+                    'size_bytes': entry['size_bytes'],
+                    'hits': entry['hits'],
+                    'loads': entry['loads'],
+                    'latency_ms': {
+                        'mean': float(latencies.mean() * 1000) if latencies.size else None,
+                        'p50': float(np.percentile(latencies, 50) * 1000) if latencies.size else None,
+                        'p95': float(np.percentile(latencies, 95) * 1000) if latencies.size else None,
+                        'samples': int(latencies.size)
+                    },
+                    'traffic_split': {
+                        version: weight for version, weight in self._split_weights(name)
+                    } if name in self._traffic_splits else None
+                })
+            return models
+    
+    def _split_weights(self, name):
+        """Convert a cumulative traffic split back into per-version weights"""
+        previous = 0.0
+        for version, cumulative in self._traffic_splits[name]:
+            yield version, cumulative - previous
+            previous = cumulative
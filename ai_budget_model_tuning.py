@@ -0,0 +1,269 @@
+# Hyperparameter Tuning Harness for the AI Budget ML Model
+# Searches forest size/depth and anomaly contamination with time-series
+# cross-validation grouped by user, evaluates candidates across a process pool,
+# records the accuracy versus inference latency trade-off of each candidate and
+# writes the best configuration out as the production model artifact.
+
+import argparse
+import itertools
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from ai_budget_ml_model import AIBudgetManager, lazy_import
+
+pd = lazy_import('pandas')
+
+# Candidate values for each hyperparameter
+DEFAULT_SEARCH_SPACE = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 8, 16],
+    'contamination': [0.05, 0.1, 0.15]
+}
+
+# Share of validation rows turned into synthetic spending spikes to score anomaly detection
+ANOMALY_INJECTION_RATE = 0.05
+
+# Worker process state, set once per worker by _init_worker
+_worker_data = {}
+
+
+def time_series_group_splits(df, n_splits=3):
+    """Build (train_index, validation_index) pairs for time-series CV grouped by user
+    
+    Each fold validates on one of the last ``n_splits`` months and trains only
+    on earlier months. Users are assigned to one fold by a stable hash, and a
+    fold's validation users never appear in its training rows, so scores
+    measure generalization to unseen users in an unseen month.
+    """
+    periods = df['date'].dt.year.to_numpy() * 12 + df['date'].dt.month.to_numpy()
+    unique_periods = np.unique(periods)
+    if len(unique_periods) <= n_splits:
+        raise ValueError(f"Need more than {n_splits} months of data for {n_splits} time-series splits")
+    
+    user_fold = np.array([zlib.crc32(str(user).encode()) % n_splits for user in df['user_id']])
+    
+    splits = []
+    for fold, cutoff in enumerate(unique_periods[-n_splits:]):
+        train_index = np.flatnonzero((periods < cutoff) & (user_fold != fold))
+        validation_index = np.flatnonzero((periods == cutoff) & (user_fold == fold))
+        if len(train_index) and len(validation_index):
+            splits.append((train_index, validation_index))
+    return splits
+
+
+def _init_worker(X, y, splits):
+    """Keep the feature matrix and folds in each worker instead of pickling them per task"""
+    _worker_data.update(X=X, y=y, splits=splits)
+
+
+def _evaluate_forest(params, fold):
+    """Fit a spending predictor on one fold and measure accuracy and latency"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    
+    X, y = _worker_data['X'], _worker_data['y']
+    train_index, validation_index = _worker_data['splits'][fold]
+    
+    scaler = StandardScaler().fit(X[train_index])
+    X_train, X_validation = scaler.transform(X[train_index]), scaler.transform(X[validation_index])
+    
+    started = time.perf_counter()
+    model = RandomForestRegressor(
+        n_estimators=params['n_estimators'],
+        max_depth=params['max_depth'],
+        random_state=42,
+        n_jobs=1
+    ).fit(X_train, y[train_index])
+    fit_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    y_pred = model.predict(X_validation)
+    batch_seconds = time.perf_counter() - started
+    
+    # Single-row latency as served by predict_spending: forest plus per-tree confidence
+    single_row_ms = []
+    for row in X_validation[:50]:
+        row = row.reshape(1, -1)
+        started = time.perf_counter()
+        model.predict(row)
+        np.var([estimator.predict(row)[0] for estimator in model.estimators_])
+        single_row_ms.append((time.perf_counter() - started) * 1000)
+    
+    return {
+        'mae': mean_absolute_error(y[validation_index], y_pred),
+        'rmse': float(np.sqrt(mean_squared_error(y[validation_index], y_pred))),
+        'r2': r2_score(y[validation_index], y_pred),
+        'fit_seconds': fit_seconds,
+        'batch_rows_per_second': len(validation_index) / batch_seconds if batch_seconds > 0 else None,
+        'latency_ms_p50': float(np.percentile(single_row_ms, 50)),
+        'latency_ms_p95': float(np.percentile(single_row_ms, 95))
+    }
+
+
+def _evaluate_contamination(contamination, fold, spike_columns):
+    """Score an anomaly detector on validation rows with injected spending spikes"""
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+    
+    X, _ = _worker_data['X'], _worker_data['y']
+    train_index, validation_index = _worker_data['splits'][fold]
+    
+    scaler = StandardScaler().fit(X[train_index])
+    detector = IsolationForest(contamination=contamination, random_state=42).fit(scaler.transform(X[train_index]))
+    
+    # Multiply recent spending of a few validation rows to create labelled anomalies
+    rng = np.random.default_rng(fold)
+    X_validation = X[validation_index].copy()
+    is_spike = rng.random(len(X_validation)) < ANOMALY_INJECTION_RATE
+    X_validation[np.ix_(is_spike, spike_columns)] *= rng.uniform(3, 6, size=(is_spike.sum(), 1))
+    
+    flagged = detector.predict(scaler.transform(X_validation)) == -1
+    true_positives = np.sum(flagged & is_spike)
+    precision = true_positives / flagged.sum() if flagged.sum() else 0.0
+    recall = true_positives / is_spike.sum() if is_spike.sum() else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    
+    return {
+        'anomaly_precision': float(precision),
+        'anomaly_recall': float(recall),
+        'anomaly_f1': float(f1),
+        'flag_rate': float(flagged.mean())
+    }
+
+
+def _summarize(fold_results):
+    """Average each metric over folds"""
+    return {
+        metric: float(np.mean([result[metric] for result in fold_results]))
+        for metric in fold_results[0]
+        if fold_results[0][metric] is not None
+    }
+
+
+def tune_model(df=None, search_space=None, n_splits=3, max_workers=None, max_latency_ms=None):
+    """Search hyperparameters and return the best configuration with all candidate results
+    
+    Forest size/depth candidates are ranked by mean validation MAE among those
+    whose median single-row latency is within ``max_latency_ms`` (if given,
+    falling back to the fastest candidate when none is).
+    Contamination is chosen by F1 on injected spending spikes.
+    """
+    search_space = {**DEFAULT_SEARCH_SPACE, **(search_space or {})}
+    manager = AIBudgetManager()
+    
+    if df is None:
+        df = manager.generate_sample_data()
+    df = manager.normalize_expenses(df).reset_index(drop=True)
+    
+    X_frame, y_series = manager.prepare_features(df)
+    X = np.ascontiguousarray(X_frame.to_numpy(dtype=np.float64))
+    y = y_series.to_numpy(dtype=np.float64)
+    splits = time_series_group_splits(df, n_splits)
+    spike_columns = [X_frame.columns.get_loc(name) for name in ['prev_month_spending', 'avg_3month_spending']]
+    
+    forest_candidates = [
+        {'n_estimators': n_estimators, 'max_depth': max_depth}
+        for n_estimators, max_depth in itertools.product(search_space['n_estimators'], search_space['max_depth'])
+    ]
+    contamination_candidates = list(search_space['contamination'])
+    
+    print(f"🔎 Evaluating {len(forest_candidates)} forest and {len(contamination_candidates)} "
+          f"contamination candidates on {len(splits)} time-series folds...")
+    started = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(X, y, splits)) as pool:
+        forest_futures = {
+            (i, fold): pool.submit(_evaluate_forest, params, fold)
+            for i, params in enumerate(forest_candidates) for fold in range(len(splits))
+        }
+        contamination_futures = {
+            (i, fold): pool.submit(_evaluate_contamination, contamination, fold, spike_columns)
+            for i, contamination in enumerate(contamination_candidates) for fold in range(len(splits))
+        }
+        
+        forest_results = [
+            {**params, **_summarize([forest_futures[(i, fold)].result() for fold in range(len(splits))])}
+            for i, params in enumerate(forest_candidates)
+        ]
+        contamination_results = [
+            {'contamination': contamination,
+             **_summarize([contamination_futures[(i, fold)].result() for fold in range(len(splits))])}
+            for i, contamination in enumerate(contamination_candidates)
+        ]
+    
+    eligible = [
+        result for result in forest_results
+        if max_latency_ms is None or result['latency_ms_p50'] <= max_latency_ms
+    ]
+    if eligible:
+        best_forest = min(eligible, key=lambda result: (result['mae'], result['latency_ms_p50']))
+    else:
+        print(f"⚠️ No candidate meets {max_latency_ms}ms, selecting the fastest one")
+        best_forest = min(forest_results, key=lambda result: result['latency_ms_p50'])
+    best_contamination = max(contamination_results, key=lambda result: result['anomaly_f1'])
+    
+    best_params = {
+        'n_estimators': best_forest['n_estimators'],
+        'max_depth': best_forest['max_depth'],
+        'contamination': best_contamination['contamination']
+    }
+    
+    print(f"✅ Tuning complete in {time.perf_counter() - started:.1f}s")
+    for result in sorted(forest_results, key=lambda result: result['mae']):
+        print(f"   • trees={result['n_estimators']}, depth={result['max_depth']}: "
+              f"MAE ${result['mae']:.2f}, p50 latency {result['latency_ms_p50']:.2f}ms")
+    print(f"🏆 Best configuration: {best_params}")
+    
+    return {
+        'best_params': best_params,
+        'forest_candidates': forest_results,
+        'contamination_candidates': contamination_results,
+        'folds': len(splits),
+        'max_latency_ms': max_latency_ms,
+        'tuned_at': datetime.now().isoformat()
+    }, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the AI Budget ML model and write the production artifact")
+    parser.add_argument('--data', help="CSV with training rows (defaults to generated sample data)")
+    parser.add_argument('--users', type=int, default=100, help="Users in generated sample data")
+    parser.add_argument('--months', type=int, default=12, help="Months in generated sample data")
+    parser.add_argument('--folds', type=int, default=3, help="Number of time-series folds")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--max-latency-ms', type=float, default=None,
+                        help="Only select forests whose median single-row latency is within this budget")
+    parser.add_argument('--output', default='ai_budget_model.pkl', help="Production model artifact to write")
+    parser.add_argument('--report', default='ai_budget_tuning_report.json', help="Where to write all candidate results")
+    args = parser.parse_args()
+    
+    if args.data:
+        df = pd.read_csv(args.data)
+    else:
+        df = AIBudgetManager().generate_sample_data(num_users=args.users, num_months=args.months)
+    
+    report, df = tune_model(df, n_splits=args.folds, max_workers=args.workers, max_latency_ms=args.max_latency_ms)
+    
+    # Retrain the winning configuration on all data and publish it
+    manager = AIBudgetManager(model_params=report['best_params'])
+    report['production_training'] = {
+        key: value for key, value in manager.train_models(df).items() if key != 'feature_importance'
+    }
+    manager.save_model(args.output)
+    report['artifact'] = os.path.abspath(args.output)
+    
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2, default=float)
+    print(f"📄 Tuning report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# Request Profiling for the AI Budget API server
+# Opt-in profiling of request handlers: a deterministic profiler (cProfile,
+# saved as .pstats) or a low-overhead sampling profiler (saved as speedscope
+# JSON) wraps handler execution, either for every request or only for those
+# sending an X-Profile header. Profiles are written to a local directory that
+# keeps only the most recent files. When profiling is off nothing is wrapped.
+
+import cProfile
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+PROFILING_MODES = ('off', 'header', 'all')
+PROFILE_FORMATS = ('pstats', 'speedscope')
+PROFILE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+\.(pstats|speedscope\.json)$')
+
+
+class SamplingProfiler:
+    """Samples one thread's call stack at a fixed interval from a background thread"""
+    
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []  # (name, file, line) in first-seen order
+        self.samples = []  # stack of frame indexes, root first
+        self.weights = []  # seconds each sample stands for
+        self._frame_index = {}
+        self.started_at = self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+    
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped_at = time.perf_counter()
+    
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_name, code.co_filename, code.co_firstlineno)
+                index = self._frame_index.get(key)
+                if index is None:
+                    index = self._frame_index[key] = len(self.frames)
+                    self.frames.append(key)
+                stack.append(index)
+                frame = frame.f_back
+            stack.reverse()
+            
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+    
+    def to_speedscope(self, name):
+        """Profile in the speedscope file format (https://www.speedscope.app)"""
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'ai_budget_profiling',
+            'shared': {
+                'frames': [{'name': func, 'file': file, 'line': line} for func, file, line in self.frames]
+            },
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.stopped_at - self.started_at,
+                'samples': self.samples,
+                'weights': self.weights
+            }]
+        }
+
+
+class RequestProfiler:
+    def __init__(self, directory='profiles', mode='off', default_format='pstats',
+                 max_profiles=50, sample_interval=0.001):
+        """Configure profiling; ``mode`` is 'off', 'header' (X-Profile requests only) or 'all'"""
+        if mode not in PROFILING_MODES:
+            raise ValueError(f"Profiling mode must be one of {PROFILING_MODES}, got {mode!r}")
+        if default_format not in PROFILE_FORMATS:
+            raise ValueError(f"Profile format must be one of {PROFILE_FORMATS}, got {default_format!r}")
+        
+        self.directory = directory
+        self.mode = mode
+        self.default_format = default_format
+        self.max_profiles = max_profiles
+        self.sample_interval = sample_interval
+        # Only one deterministic profiler can be active per process on newer Pythons
+        self._cprofile_lock = threading.Lock()
+        self._retention_lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+    
+    def requested_format(self, headers):
+        """Profile format for a request, or None if it should not be profiled
+        
+        In 'header' mode a request opts in with ``X-Profile: 1`` (default
+        format), ``X-Profile: pstats`` or ``X-Profile: speedscope``. In 'all'
+        mode every request is profiled unless it sends ``X-Profile: 0``.
+        """
+        value = headers.get('X-Profile', '').strip().lower()
+        if value in ('0', 'false', 'off'):
+            return None
+        if value in PROFILE_FORMATS:
+            return value
+        if value or self.mode == 'all':
+            return self.default_format
+        return None
+    
+    def wrap(self, view, endpoint, get_headers, add_header):
+        """Wrap a handler so that requested calls are profiled
+        
+        ``get_headers`` returns the current request headers and
+        ``add_header(response, name)`` attaches the saved profile name to the
+        handler's response and returns it.
+        """
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            profile_format = self.requested_format(get_headers())
+            if profile_format is None:
+                return view(*args, **kwargs)
+            response, name = self.run(endpoint, profile_format, view, *args, **kwargs)
+            return add_header(response, name) if name else response
+        return wrapper
+    
+    def run(self, endpoint, profile_format, func, *args, **kwargs):
+        """Call ``func`` under a profiler and save the profile; returns ``(result, profile_name)``"""
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{endpoint}-{uuid.uuid4().hex[:6]}"
+        
+        if profile_format == 'speedscope':
+            sampler = SamplingProfiler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                sampler.stop()
+            name += '.speedscope.json'
+            self._write(name, lambda path: self._dump_json(path, sampler.to_speedscope(endpoint)))
+            return result, name
+        
+        # A concurrent deterministic profile is already running; serve unprofiled
+        if not self._cprofile_lock.acquire(blocking=False):
+            return func(*args, **kwargs), None
+        try:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.disable()
+        finally:
+            self._cprofile_lock.release()
+        name += '.pstats'
+        self._write(name, profiler.dump_stats)
+        return result, name
+    
+    @staticmethod
+    def _dump_json(path, data):
+        with open(path, 'w') as f:
+            json.dump(data, f)
+    
+    def _write(self, name, dump):
+        """Save a profile and delete the oldest ones beyond ``max_profiles``"""
+        os.makedirs(self.directory, exist_ok=True)
+        dump(os.path.join(self.directory, name))
+        with self._retention_lock:
+            profiles = self.list_profiles()
+            for stale in profiles[self.max_profiles:]:
+                try:
+                    os.remove(os.path.join(self.directory, stale['name']))
+                except FileNotFoundError:
+                    pass
+    
+    def list_profiles(self):
+        """Saved profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory)
+             if entry.is_file() and PROFILE_NAME_PATTERN.match(entry.name)),
+            key=lambda entry: (entry.stat().st_mtime, entry.name),
+            reverse=True
+        )
+        return [{
+            'name': entry.name,
+            'format': 'speedscope' if entry.name.endswith('.speedscope.json') else 'pstats',
+            'size_bytes': entry.stat().st_size,
+            'created_at': datetime.fromtimestamp(entry.stat().st_mtime).isoformat()
+        } for entry in entries]
+    
+    def profile_path(self, name):
+        """Path of a saved profile, or None for unknown or unsafe names"""
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,179 @@
+# Response Cache for the AI Budget API server
+# Deduplicates identical analytics requests: responses are cached under a
+# canonical hash of the request body and model version, concurrent identical
+# requests share a single computation, memory use is bounded with LRU
+# eviction, and an optional SQLite tier keeps results across worker restarts.
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """An in-progress computation that identical requests wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=3600, disk_path=None, wait_timeout=60):
+        """Initialize the cache; ``disk_path`` enables the SQLite tier"""
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.wait_timeout = wait_timeout
+        
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, status, body), in LRU order
+        self._bytes = 0
+        self._inflight = {}
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+        
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False, timeout=5)
+            self._disk.execute('PRAGMA journal_mode=WAL')
+            self._disk.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, status INTEGER, body BLOB, expires_at REAL)'
+            )
+            self._disk.commit()
+    
+    @staticmethod
+    def make_key(*parts):
+        """Canonical hash of JSON-serializable key parts, independent of dict order"""
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    
+    def get_or_compute(self, key, compute):
+        """Return ``(status, body, source)`` for ``key``, computing it at most once
+        
+        ``compute`` returns ``(status, body, cacheable)``. ``source`` is 'hit',
+        'disk', 'coalesced' (shared with a concurrent identical request) or
+        'miss'.
+        """
+        with self._lock:
+            cached = self._get_memory(key)
+            if cached is not None:
+                self.stats['hits'] += 1
+                return cached[0], cached[1], 'hit'
+            
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        
+        if not leader:
+            # Wait for the identical request already being computed
+            if flight.done.wait(self.wait_timeout) and flight.result is not None:
+                with self._lock:
+                    self.stats['coalesced'] += 1
+                return flight.result[0], flight.result[1], 'coalesced'
+            status, body, _ = compute()
+            return status, body, 'miss'
+        
+        try:
+            cached = self._get_disk(key)
+            if cached is not None:
+                status, body, expires_at = cached
+                source = 'disk'
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                    self._put_memory(key, status, body, expires_at)
+            else:
+                status, body, cacheable = compute()
+                source = 'miss'
+                with self._lock:
+                    self.stats['misses'] += 1
+                    if cacheable:
+                        self._put_memory(key, status, body, time.time() + self.ttl_seconds)
+                if cacheable:
+                    self._put_disk(key, status, body)
+            flight.result = (status, body)
+            return status, body, source
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+    
+    def _get_memory(self, key):
+        """Look up a fresh in-memory entry and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, status, body = entry
+        if expires_at < time.time():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return status, body
+    
+    def _put_memory(self, key, status, body, expires_at):
+        """Store an entry and evict least recently used ones beyond the memory budget"""
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (expires_at, status, body)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+    
+    def _drop(self, key):
+        """Remove an in-memory entry"""
+        _, _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+    
+    def _get_disk(self, key):
+        """Look up a fresh entry in the SQLite tier"""
+        if self._disk is None:
+            return None
+        with self._disk_lock:
+            row = self._disk.execute(
+                'SELECT status, body, expires_at FROM responses WHERE key = ? AND expires_at >= ?',
+                (key, time.time())
+            ).fetchone()
+        return (row[0], bytes(row[1]), row[2]) if row else None
+    
+    def _put_disk(self, key, status, body):
+        """Write an entry to the SQLite tier, purging expired rows now and then"""
+        if self._disk is None:
+            return
+        with self._disk_lock:
+            self._disk.execute(
+                'INSERT OR REPLACE INTO responses (key, status, body, expires_at) VALUES (?, ?, ?, ?)',
+                (key, status, body, time.time() + self.ttl_seconds)
+            )
+            self._disk_writes += 1
+            if self._disk_writes % 100 == 0:
+                self._disk.execute('DELETE FROM responses WHERE expires_at < ?', (time.time(),))
+            self._disk.commit()
+    
+    def clear(self):
+        """Drop all cached responses from memory and disk"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute('DELETE FROM responses')
+                self._disk.commit()
+    
+    def describe(self):
+        """Cache size and hit statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'disk_tier': self._disk is not None
+            }
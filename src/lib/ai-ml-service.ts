@@ -5,7 +5,7 @@ interface MLAPIResponse<T> {
   success: boolean;
   data?: T;
   error?: string;
-  timestamp?: string;
+  timestamp?: string;  // When the result was computed; cached analytics responses keep the original time
 }
 
 interface UserData {
@@ -244,6 +244,16 @@ class AIBudgetMLService {
     return response.success && response.data ? response.data : null;
   }
 
+  async getSpendingForecast(userData: UserData, horizon: number = 3, expenses?: ExpenseData[]): Promise<any> {
+    const response = await this.makeRequest<{ forecast: any }>('/api/spending-forecast', {
+      ...userData,
+      horizon,
+      ...(expenses ? { expenses } : {})
+    });
+
+    return response.success && response.data ? response.data.forecast : null;
+  }
+
   async getSeasonalAnalysis(expenses: ExpenseData[]): Promise<any> {
     const response = await this.makeRequest<any>('/api/seasonal-analysis', {
       expenses
@@ -252,6 +262,15 @@ class AIBudgetMLService {
     return response.success && response.data ? response.data : null;
   }
 
+  async ingestExpenses(userId: string, expenses: ExpenseData[]): Promise<boolean> {
+    const response = await this.makeRequest<any>('/api/expenses/ingest', {
+      user_id: userId,
+      expenses
+    });
+
+    return response.success;
+  }
+
   async retrainModel(trainingData?: any[]): Promise<boolean> {
     const response = await this.makeRequest<any>('/api/retrain-model', 
       trainingData ? { training_data: trainingData } : {}